@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+import os
+import re
+import sys
+from functools import lru_cache
+from typing import Dict, List, Tuple
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tiktoken
+
+from logs import config as save
+log = save.setup_logs('orchestrator_debug.txt')
+
+
+ENCODING = "cl100k_base"
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+SECTION_START = re.compile(
+    r"^(Abstract|Introduction|Background|Materials and Methods|Methods|Results|Discussion|Conclusions?)\b"
+)
+
+
+@lru_cache(maxsize=None)
+def get_encoder(name: str = ENCODING) -> tiktoken.Encoding:
+    """tiktoken loads and builds the BPE ranks on every get_encoding call, keep one per process"""
+    return tiktoken.get_encoding(name)
+
+
+class Chunker():
+    """Splits publication texts into chunks that fit the model context.
+
+    "tokens" is the historical behaviour, fixed windows of `max_tokens`
+    decoded back to text. "sentences" packs whole sentences instead and
+    starts a new chunk at section headings (Introduction, Methods, ...)
+    once the current one is reasonably full, so no sentence is cut in
+    half. Both modes accept an overlap, repeated at the start of the next
+    chunk, and every chunk carries its exact token count.
+    """
+    MODES = ("tokens", "sentences")
+    MIN_SECTION_FILL = 0.25
+
+    def __init__(self, max_tokens: int = 700, overlap: int = 0, mode: str = "tokens", threads: int = 4,
+                 encoding: str = ENCODING, encoder=None):
+        """
+        Args:
+            max_tokens (int): tokens allowed in a chunk
+            overlap (int): tokens of the previous chunk repeated in the next one
+            mode (str): "tokens" or "sentences"
+            threads (int): threads of tiktoken's encode_batch
+            encoding (str): tiktoken encoding name
+            encoder: counts with this instead of tiktoken, any object with its
+                encode, encode_batch and decode (e.g. Embedder.encoder)
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown chunking mode '{mode}', use one of {self.MODES}")
+        if not 0 <= overlap < max_tokens:
+            raise ValueError("overlap must be between 0 and max_tokens - 1")
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.mode = mode
+        self.threads = threads
+        self.encoding = encoding
+        self.custom_encoder = encoder
+
+    @property
+    def encoder(self) -> tiktoken.Encoding:
+        return self.custom_encoder or get_encoder(self.encoding)
+
+    def encode_batch(self, texts: List[str]) -> List[List[int]]:
+        """Encode many texts at once, tiktoken releases the GIL across `threads`"""
+        return self.encoder.encode_batch(texts, num_threads=self.threads)
+
+    def chunk(self, text: str) -> List[Dict]:
+        return self.chunk_batch([text])[0]
+
+    def chunk_batch(self, texts: List[str]) -> List[List[Dict]]:
+        """Chunk several documents with a single batch encoding
+
+        Returns:
+            chunks (List[List[Dict]]): per document, [{"index", "text", "tokens"}]
+        """
+        if self.mode == "tokens":
+            # a window is counted by its slice of the document tokens, nothing is encoded twice
+            return [
+                [
+                    {"index": i, "text": self.encoder.decode(window), "tokens": len(window)}
+                    for i, window in enumerate(self.windows(tokens))
+                ]
+                for tokens in self.encode_batch(texts)
+            ]
+
+        pieces = [self.sentence_chunks(text) for text in texts]
+        flat = [piece for document in pieces for piece in document]
+        counts = iter(len(tokens) for tokens in self.encode_batch(flat)) if flat else iter(())
+        return [
+            [{"index": i, "text": piece, "tokens": next(counts)} for i, piece in enumerate(document)]
+            for document in pieces
+        ]
+
+    def windows(self, tokens: List[int]) -> List[List[int]]:
+        step = self.max_tokens - self.overlap
+        return [
+            tokens[start:start + self.max_tokens]
+            for start in range(0, len(tokens), step)
+            if start == 0 or start + self.overlap < len(tokens)
+        ]
+
+    def token_windows(self, tokens: List[int]) -> List[str]:
+        return [self.encoder.decode(window) for window in self.windows(tokens)]
+
+    def sentence_chunks(self, text: str) -> List[str]:
+        sentences = [sentence for sentence in SENTENCE_END.split(text.strip()) if sentence]
+        if not sentences:
+            return []
+        # counted with the space that joins them, as they appear inside a chunk
+        sizes = [len(tokens) for tokens in self.encode_batch([" " + sentence for sentence in sentences])]
+
+        # `carried` sentences at the start of `current` are the overlap of the previous chunk
+        chunks, current, carried, position = [], [], 0, 0
+        while position < len(sentences) or len(current) > carried:
+            if position == len(sentences):
+                size, full = 0, True
+            else:
+                sentence, size = sentences[position], sizes[position]
+                used = sum(tokens for _, tokens in current)
+                section = SECTION_START.match(sentence) and used >= self.max_tokens * self.MIN_SECTION_FILL
+                full = size > self.max_tokens or used + size > self.max_tokens or section
+
+            if full and len(current) > carried:
+                kept = self.close(chunks, current, carried)
+                # the sentences the joined count left out open the next chunk
+                position -= len(current) - kept
+                room = self.max_tokens - sizes[position] if position < len(sentences) else 0
+                current = self.tail(current[:kept], room) if room >= 0 else []
+                carried = len(current)
+                continue
+
+            if size > self.max_tokens:
+                # a "sentence" longer than a chunk (tables, lists) falls back to token windows
+                chunks.extend(self.token_windows(self.encoder.encode(sentence)))
+                current, carried = [], 0
+            else:
+                current.append((sentence, size))
+            position += 1
+        return chunks
+
+    def close(self, chunks: List[str], current: List[Tuple[str, int]], carried: int) -> int:
+        """Append the chunk of `current`, counting the joined text itself: the
+        sizes of its sentences only estimate it, so while it is over
+        max_tokens its last sentences are left out
+
+        Returns:
+            kept (int): sentences of `current` in the chunk
+        """
+        for kept in range(len(current), carried, -1):
+            text = " ".join(part for part, _ in current[:kept])
+            if len(self.encoder.encode(text)) <= self.max_tokens:
+                break
+        else:
+            # not even the overlap and one new sentence fit, the sentence goes alone
+            text = current[carried][0]
+        chunks.append(text)
+        return kept
+
+    def tail(self, sentences: List[Tuple[str, int]], room: int) -> List[Tuple[str, int]]:
+        """Last (sentence, tokens) of a chunk that fit in `overlap` and in the room left"""
+        kept, used = [], 0
+        for sentence, tokens in reversed(sentences):
+            if used + tokens > min(self.overlap, room):
+                break
+            kept.insert(0, (sentence, tokens))
+            used += tokens
+        return kept
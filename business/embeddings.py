@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+import os
+import re
+import sys
+import time
+import threading
+from typing import Dict, Iterable, List, Tuple
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import faiss
+import numpy as np
+import torch
+from filelock import FileLock
+from transformers import AutoModel, AutoTokenizer
+
+from business.chunker import Chunker
+from business.handle_db import HandlerDatabase
+from models_bio.themes import search_text
+
+from logs import config as save
+log = save.setup_logs('embeddings_debug.txt')
+
+
+EMBEDDINGS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.embeddings'))
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+KINDS = ("chunk", "theme")
+
+
+class TokenizerEncoder():
+    """A Hugging Face tokenizer behind the tiktoken methods Chunker uses,
+    so chunks are measured in the tokens the encoder truncates at"""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+
+    def encode(self, text: str) -> List[int]:
+        return self.tokenizer.encode(text, add_special_tokens=False)
+
+    def encode_batch(self, texts: List[str], num_threads: int = None) -> List[List[int]]:
+        return self.tokenizer(texts, add_special_tokens=False)["input_ids"] if texts else []
+
+    def decode(self, tokens: List[int]) -> str:
+        return self.tokenizer.decode(tokens)
+
+
+class Embedder():
+    """Sentence vectors from a local transformers encoder, on CPU.
+
+    Texts are sorted by length before batching so each batch pads to
+    similar sizes, then mean-pooled over the attention mask and L2
+    normalised: the inner product of two vectors is their cosine.
+    """
+
+    def __init__(self, model_name: str = None, batch_size: int = 32, max_length: int = 256, threads: int = None):
+        """
+        Args:
+            model_name (str): Hugging Face model, defaults to EMBEDDING_MODEL or all-MiniLM-L6-v2
+            batch_size (int): texts per forward pass
+            max_length (int): tokens kept of each text
+            threads (int): torch intra-op threads, torch's default when None
+        """
+        self.model_name = model_name or os.getenv("EMBEDDING_MODEL", MODEL_NAME)
+        self.batch_size = max(batch_size, 1)
+        self.max_length = max_length
+        if threads:
+            torch.set_num_threads(threads)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self.model = AutoModel.from_pretrained(self.model_name).eval()
+
+    @property
+    def dim(self) -> int:
+        return self.model.config.hidden_size
+
+    @property
+    def encoder(self) -> TokenizerEncoder:
+        """Token counter for Chunker; a chunk of max_length - 2 tokens (the
+        [CLS] and [SEP] added to every text) is embedded whole"""
+        return TokenizerEncoder(self.tokenizer)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """float32 matrix, one normalised row per text, in the order given"""
+        vectors = np.zeros((len(texts), self.dim), dtype="float32")
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        with torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                batch = order[start:start + self.batch_size]
+                tokens = self.tokenizer(
+                    [texts[i] for i in batch], padding=True, truncation=True,
+                    max_length=self.max_length, return_tensors="pt",
+                )
+                hidden = self.model(**tokens).last_hidden_state
+                mask = tokens["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                vectors[batch] = torch.nn.functional.normalize(pooled, dim=1).numpy()
+        return vectors
+
+
+def index_path(model_name: str, directory: str = None) -> str:
+    """One FAISS file per model, vectors of different models never mix"""
+    directory = directory or os.getenv("EMBEDDINGS_DIR", EMBEDDINGS_DIR)
+    return os.path.join(directory, re.sub(r"[^\w.-]+", "_", model_name) + ".faiss")
+
+
+class VectorIndex():
+    """FAISS inner-product index whose ids are nasa.embeddings ids.
+
+    Exact search (IndexFlatIP) answers in a few milliseconds for the
+    hundreds of thousands of vectors of this corpus. The file is written
+    to a temporary name and renamed, so readers never see half of it, and
+    read-only users memory-map it instead of loading it.
+    """
+
+    def __init__(self, path: str, dim: int = None):
+        self.path = path
+        self.dim = dim
+        self.index = None
+        self.mtime = None
+
+    def load(self, mmap: bool = True) -> "VectorIndex":
+        if os.path.exists(self.path):
+            flags = (getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY) if mmap else 0
+            self.mtime = os.stat(self.path).st_mtime_ns
+            self.index = faiss.read_index(self.path, flags)
+            if self.dim is not None and self.index.d != self.dim:
+                raise ValueError(f"{self.path} holds {self.index.d}-d vectors, the model gives {self.dim}")
+            self.dim = self.index.d
+        elif self.dim is not None:
+            self.index = faiss.IndexIDMap(faiss.IndexFlatIP(self.dim))
+        return self
+
+    def changed(self) -> bool:
+        """True when another process saved a newer file since load()"""
+        try:
+            return os.stat(self.path).st_mtime_ns != self.mtime
+        except FileNotFoundError:
+            return False
+
+    def ids(self) -> set:
+        if self.index is None:
+            return set()
+        return set(faiss.vector_to_array(self.index.id_map).tolist())
+
+    def add(self, ids: List[int], vectors: np.ndarray):
+        if len(ids):
+            self.index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+
+    def remove(self, ids: Iterable[int]) -> int:
+        ids = np.asarray(list(ids), dtype="int64")
+        return self.index.remove_ids(ids) if len(ids) else 0
+
+    def search(self, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self.index is None or self.index.ntotal == 0:
+            return np.zeros((len(vectors), 0), dtype="float32"), np.zeros((len(vectors), 0), dtype="int64")
+        return self.index.search(vectors, min(k, self.index.ntotal))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        faiss.write_index(self.index, temporary)
+        os.replace(temporary, self.path)
+        self.mtime = os.stat(self.path).st_mtime_ns
+
+
+class EmbeddingIndexer():
+    """Keeps the FAISS file of a model in step with the database.
+
+    sync() embeds the chunks of every publication whose text changed and
+    the merged themes of every publication whose themes changed since
+    their vectors were computed, so after an analysis run only the newly
+    analysed documents are embedded. The nasa.embeddings rows are replaced
+    first, then the vectors; a run that dies in between is repaired by the
+    next sync, which re-embeds the rows missing from the file and drops
+    the vectors without a row.
+    """
+
+    def __init__(self, handle: HandlerDatabase, embedder: Embedder, chunker: Chunker = None,
+                 directory: str = None, batch_size: int = 16, save_every: int = 20):
+        """
+        Args:
+            chunker (Chunker): how publications are cut, by default sentence chunks of 200
+                tokens of the embedder's own tokenizer, well under the max_length it keeps
+            batch_size (int): publications embedded per database transaction
+            save_every (int): batches between two writes of the FAISS file
+        """
+        self.handle = handle
+        self.embedder = embedder
+        self.chunker = chunker or Chunker(max_tokens=200, overlap=20, mode="sentences", encoder=embedder.encoder)
+        self.batch_size = max(batch_size, 1)
+        self.save_every = max(save_every, 1)
+        self.vectors = VectorIndex(index_path(embedder.model_name, directory), dim=embedder.dim)
+
+    def sync(self, publication_ids: List[int] = None) -> Dict:
+        """Embed what is missing or outdated, every publication or only `publication_ids`
+
+        Returns:
+            summary (Dict): publications, vectors added and removed, seconds
+        """
+        start = time.perf_counter()
+        summary = {"publications": 0, "added": 0, "removed": 0, "seconds": 0.0}
+        model_name = self.embedder.model_name
+        os.makedirs(os.path.dirname(self.vectors.path), exist_ok=True)
+
+        # one writer per file, also across the machines sharing the directory
+        with FileLock(self.vectors.path + ".lock"):
+            self.vectors.load(mmap=False)
+            missing = self.reconcile(summary)
+            if publication_ids is not None:
+                publication_ids = sorted(set(publication_ids) | missing)
+            stale = self.handle.call("get_stale_embeddings", model_name=model_name, publication_ids=publication_ids)
+            log.info(f"🚀 {len(stale)} publications to embed with {model_name}")
+
+            for number, first in enumerate(range(0, len(stale), self.batch_size), start=1):
+                self.embed_batch(stale[first:first + self.batch_size], summary)
+                if number % self.save_every == 0:
+                    self.save()
+            self.save()
+
+        summary["seconds"] = round(time.perf_counter() - start, 2)
+        log.info(f"🏁 Embeddings synced: {summary}")
+        return summary
+
+    def save(self):
+        """Write the FAISS file, then bump the corpus version: the search
+        responses cached while the rows were ahead of the file expire only
+        once the new vectors can be found"""
+        self.vectors.save()
+        self.handle.call("bump_corpus_version")
+
+    def reconcile(self, summary: Dict) -> set:
+        """Drop the vectors without a row and the rows of publications with a
+        vector missing, which makes them stale again
+
+        Returns:
+            missing (set): publications whose rows were dropped
+        """
+        rows = self.handle.call("get_embedding_ids", model_name=self.embedder.model_name)
+        stored = self.vectors.ids()
+        summary["removed"] += self.vectors.remove(stored - set(rows))
+
+        missing = {rows[id] for id in set(rows) - stored}
+        if missing:
+            log.warning(f"⚠️ {len(missing)} publications have rows without vectors, embedding them again")
+            for kind in KINDS:
+                removed, _ = self.handle.call(
+                    "replace_embeddings", model_name=self.embedder.model_name, kind=kind,
+                    groups={publication_id: [] for publication_id in missing},
+                )
+                summary["removed"] += self.vectors.remove(set(removed) & stored)
+        return missing
+
+    def embed_batch(self, entries: List[Dict], summary: Dict):
+        sources = {
+            row.id: row
+            for row in self.handle.call("get_embedding_sources", publication_ids=[entry["publication_id"] for entry in entries])
+        }
+        chunked = self.chunker.chunk_batch([
+            sources[entry["publication_id"]].text_extratect or "" if entry["chunks"] else ""
+            for entry in entries if entry["publication_id"] in sources
+        ])
+        chunks, themes = {}, {}
+        for entry, document in zip([entry for entry in entries if entry["publication_id"] in sources], chunked):
+            publication_id = entry["publication_id"]
+            if entry["chunks"]:
+                text_hash = entry.get("text_hash")
+                chunks[publication_id] = [
+                    {"chunk_index": chunk["index"], "theme": None, "content": chunk["text"], "source_hash": text_hash}
+                    for chunk in document
+                ]
+            if entry["themes"]:
+                themes_hash = entry.get("themes_hash")
+                themes[publication_id] = [
+                    {"chunk_index": None, "theme": theme, "content": f"{theme}\n{search_text(details)}".strip(), "source_hash": themes_hash}
+                    for theme, details in (sources[publication_id].themes or {}).items()
+                ]
+
+        for kind, groups in (("chunk", chunks), ("theme", themes)):
+            if not groups:
+                continue
+            rows = [row for items in groups.values() for row in items]
+            vectors = self.embedder.embed([row["content"] for row in rows]) if rows else None
+            removed, inserted = self.handle.call(
+                "replace_embeddings", model_name=self.embedder.model_name, kind=kind, groups=groups
+            )
+            summary["removed"] += self.vectors.remove(removed)
+            if rows:
+                self.vectors.add(inserted, vectors)
+            summary["added"] += len(inserted)
+        summary["publications"] += len(sources)
+
+
+class SemanticSearch():
+    """Query side, for the web workers.
+
+    The model is loaded by ready(), at worker start in main/app.py, and the FAISS
+    file is memory-mapped, then mapped again whenever the indexer saved a
+    newer one. Hits are joined with nasa.embeddings for what they stand for.
+    """
+
+    def __init__(self, handle: HandlerDatabase, model_name: str = None, directory: str = None):
+        self.handle = handle
+        self.model_name = model_name or os.getenv("EMBEDDING_MODEL", MODEL_NAME)
+        self.directory = directory
+        self.embedder = None
+        self.vectors = None
+        self.lock = threading.Lock()
+
+    def ready(self) -> Tuple[Embedder, VectorIndex]:
+        with self.lock:
+            if self.embedder is None:
+                self.embedder = Embedder(self.model_name, threads=int(os.getenv("EMBEDDING_THREADS", "1")))
+            if self.vectors is None or self.vectors.changed():
+                self.vectors = VectorIndex(index_path(self.model_name, self.directory), dim=self.embedder.dim).load(mmap=True)
+            return self.embedder, self.vectors
+
+    def search(self, query: str, k: int = 10, kind: str = None) -> List[Dict]:
+        """Top `k` chunks and themes closest to `query`, only of `kind` when given
+
+        Returns:
+            hits (List[Dict]): [{"id", "publication_id", "kind", "chunk_index", "theme",
+                "content", "title", "url", "score"}], best first
+        """
+        embedder, vectors = self.ready()
+        scores, ids = vectors.search(embedder.embed([query]), k * 4 if kind else k)
+        found = [(int(id), float(score)) for id, score in zip(ids[0], scores[0]) if id != -1]
+        rows = self.handle.call("get_embeddings", ids=[id for id, _ in found])
+
+        hits = []
+        for id, score in found:
+            row = rows.get(id)
+            # vectors of rows deleted since the file was saved are skipped
+            if row is None or (kind and row["kind"] != kind):
+                continue
+            hits.append(dict(row, score=round(score, 4)))
+            if len(hits) == k:
+                break
+        return hits
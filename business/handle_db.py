@@ -5,19 +5,30 @@
 
 import os
 import sys
+import inspect
 from typing import Union
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from orm import database
+from orm import async_database
 
 class HandlerDatabase():
     """Database user interface"""
-    def __init__(self):
-        self.db = database.Database()
+    def __init__(self, scoped: bool = False, async_reads: bool = False):
+        """
+        Args:
+            scoped (bool): see Database
+            async_reads (bool): serve the reads AsyncDatabase implements on its
+                asyncpg event loop, everything else still goes to Database
+        """
+        self.db = database.Database(scoped=scoped)
+        self.reader = async_database.AsyncDatabase() if async_reads else None
 
     def call(self, func_name: str, **kwargs):
         """Call any function dynamically from Database"""
+        if self.reader is not None and inspect.iscoroutinefunction(getattr(self.reader, func_name, None)):
+            return self.reader.run(getattr(self.reader, func_name)(**kwargs))
         if not hasattr(self.db, func_name):
             raise AttributeError(f"Function '{func_name}' not found in Database class.")
         func = getattr(self.db, func_name)
-        return func(**kwargs)
\ No newline at end of file
+        return func(**kwargs)
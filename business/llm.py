@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, List
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import ollama
+import diskcache
+
+from logs import config as save
+log = save.setup_logs('orchestrator_debug.txt')
+
+
+CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.llm_cache'))
+
+
+class LlmCache():
+    """Persistent cache of chat answers, content addressed.
+
+    The key is a sha256 of the model tag, the messages and the call options,
+    so a cached answer is only reused when the exact same prompt goes to the
+    exact same model. Changing a template or a chunk changes the key and
+    only that call runs again. diskcache keeps the entries in SQLite on disk,
+    evicting the least recently used once `size_mb` is exceeded.
+    """
+
+    def __init__(self, directory: str = None, size_mb: int = None):
+        """
+        Args:
+            directory (str): cache folder, defaults to LLM_CACHE_DIR or .llm_cache
+            size_mb (int): size bound, defaults to LLM_CACHE_SIZE_MB or 1024
+        """
+        self.directory = directory or os.getenv("LLM_CACHE_DIR", CACHE_DIR)
+        size_mb = size_mb or int(os.getenv("LLM_CACHE_SIZE_MB", "1024"))
+        self.cache = diskcache.Cache(
+            self.directory,
+            size_limit=size_mb * 1024 * 1024,
+            eviction_policy="least-recently-used",
+        )
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, messages: List[Dict], options: Dict) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": messages, "options": options},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        value = self.cache.get(key)
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: Dict):
+        self.cache.set(key, value)
+
+    def delete(self, key: str):
+        self.cache.delete(key)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "entries": len(self.cache),
+                "size_mb": round(self.cache.volume() / 1024 / 1024, 2),
+            }
+
+
+class CallStats():
+    """Timings of every LLM call, to tune num_ctx, num_predict and keep_alive.
+
+    Each call is logged with its time to first token, generation speed,
+    token counts and why it stopped ("stop", "length" when num_predict was
+    reached, "early_stop" when the caller had what it needed, "timeout");
+    summary() aggregates them by model.
+    """
+    NANO = 1e9
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def record(self, model: str, stop: str, seconds: float, ttft: float = None, final=None, parts: int = 0):
+        """
+        Args:
+            final: last ChatResponse (done=True) with Ollama's counters, when it arrived
+            parts (int): streamed pieces received, about one token each
+        """
+        eval_count = getattr(final, "eval_count", None) or parts
+        eval_duration = (getattr(final, "eval_duration", None) or 0) / self.NANO
+        if ttft is None and final is not None:
+            ttft = ((final.load_duration or 0) + (final.prompt_eval_duration or 0)) / self.NANO
+        generating = eval_duration or max(seconds - (ttft or 0), 0)
+        call = {
+            "model": model,
+            "stop": stop,
+            "seconds": round(seconds, 3),
+            "ttft": round(ttft, 3) if ttft is not None else None,
+            "prompt_tokens": getattr(final, "prompt_eval_count", None),
+            "tokens": eval_count,
+            "tokens_per_second": round(eval_count / generating, 1) if generating else None,
+        }
+        with self.lock:
+            self.calls.append(call)
+        log.info(f"LLM call: {call}")
+        return call
+
+    def summary(self) -> Dict:
+        with self.lock:
+            calls = list(self.calls)
+        report = {}
+        for model in sorted({call["model"] for call in calls}):
+            mine = [call for call in calls if call["model"] == model]
+            ttfts = [call["ttft"] for call in mine if call["ttft"] is not None]
+            speeds = [call["tokens_per_second"] for call in mine if call["tokens_per_second"]]
+            stops = {}
+            for call in mine:
+                stops[call["stop"]] = stops.get(call["stop"], 0) + 1
+            report[model] = {
+                "calls": len(mine),
+                "tokens": sum(call["tokens"] or 0 for call in mine),
+                "mean_ttft": round(sum(ttfts) / len(ttfts), 3) if ttfts else None,
+                "mean_tokens_per_second": round(sum(speeds) / len(speeds), 1) if speeds else None,
+                "stops": stops,
+            }
+        return report
+
+
+class LlmClient():
+    """Ollama client shared by every pipeline worker.
+
+    Each model has its own concurrency limit, so qwen chunks of one
+    document can run while llama synthesizes another without flooding the
+    server. The server itself must allow parallel requests
+    (OLLAMA_NUM_PARALLEL) for the limits above 1 to overlap.
+    """
+    DEFAULT_LIMIT = 1
+
+    def __init__(self, host: str = None, limits: Dict[str, int] = None, cache: LlmCache = None,
+                 options: Dict[str, Dict] = None, keep_alive: str = None, timeout: float = None):
+        """
+        Args:
+            host (str): Ollama address, defaults to OLLAMA_HOST or the local server
+            limits (Dict[str, int]): maximum simultaneous calls by model name
+            cache (LlmCache): answers reused across runs, no cache when None
+            options (Dict[str, Dict]): default Ollama options by model name (num_ctx, num_predict, ...)
+            keep_alive (str): how long Ollama keeps the models loaded, e.g. "30m"
+            timeout (float): seconds a call may take; streamed calls are cut when exceeded
+        """
+        self.host = host or os.getenv("OLLAMA_HOST")
+        self.timeout = timeout
+        self.client = ollama.Client(host=self.host, timeout=timeout)
+        self.limits = dict(limits or {})
+        self.options = dict(options or {})
+        self.keep_alive = keep_alive
+        self.cache = cache
+        self.stats = CallStats()
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    def semaphore(self, model: str) -> threading.BoundedSemaphore:
+        with self.lock:
+            if model not in self.semaphores:
+                self.semaphores[model] = threading.BoundedSemaphore(self.limits.get(model, self.DEFAULT_LIMIT))
+            return self.semaphores[model]
+
+    def prepare(self, model: str, kwargs: Dict) -> Dict:
+        """Call options: the model defaults overridden by the ones of the call"""
+        options = {**self.options.get(model, {}), **(kwargs.get("options") or {})}
+        if options:
+            kwargs["options"] = options
+        if self.keep_alive is not None:
+            kwargs.setdefault("keep_alive", self.keep_alive)
+        return kwargs
+
+    def chat(self, model: str, messages: List[Dict], accept=None, **kwargs):
+        """ollama.chat, answered from the cache when possible and otherwise
+        waiting for a free slot of the model first.
+
+        `accept` is called with every answer, fresh or cached, and raises
+        when it is unusable (e.g. invalid JSON). Only complete answers
+        (done_reason "stop") that it accepted are cached, and a cached answer
+        it rejects is dropped, so the next run asks the model again.
+        """
+        timeout = kwargs.pop("timeout", None) or self.timeout
+        kwargs = self.prepare(model, kwargs)
+        if kwargs.get("stream"):
+            return self.stream(model, messages, timeout=timeout, **kwargs)
+
+        key = self.cache.key(model, messages, kwargs) if self.cache is not None else None
+        cached = self.cache.get(key) if key else None
+        if cached is not None:
+            log.debug(f"LLM cache hit for {model} ({key[:12]})")
+            response = ollama.ChatResponse.model_validate(cached)
+            try:
+                if accept:
+                    accept(response)
+            except Exception:
+                self.cache.delete(key)
+                raise
+            return response
+
+        with self.semaphore(model):
+            start = time.perf_counter()
+            response = self.client.chat(model=model, messages=messages, **kwargs)
+            self.stats.record(model, response.done_reason or "stop", time.perf_counter() - start, final=response)
+        if accept:
+            accept(response)
+        if key and response.done_reason == "stop":
+            self.cache.set(key, response.model_dump(mode="json"))
+        return response
+
+    def stream(self, model: str, messages: List[Dict], timeout: float = None, **kwargs):
+        """Streamed ollama.chat; the model slot is held until the stream is
+        exhausted or closed, not only while the request is sent. The stream
+        ends quietly once `timeout` seconds have passed, and closing it early
+        (the caller already has its JSON) stops the generation on the server"""
+        with self.semaphore(model):
+            start = time.perf_counter()
+            ttft, final, received, stop = None, None, 0, "early_stop"
+            parts = self.client.chat(model=model, messages=messages, **kwargs)
+            try:
+                for part in parts:
+                    if part.done:
+                        final, stop = part, part.done_reason or "stop"
+                    if part.message and part.message.content:
+                        if ttft is None:
+                            ttft = time.perf_counter() - start
+                        received += 1
+                    yield part
+                    if timeout and time.perf_counter() - start > timeout:
+                        stop = "timeout"
+                        log.warning(f"⏱️ {model} call cut after {timeout}s")
+                        break
+            finally:
+                close = getattr(parts, "close", None)
+                if close:
+                    close()
+                self.stats.record(model, stop, time.perf_counter() - start, ttft=ttft, final=final, parts=received)
@@ -8,77 +8,33 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import json
-import ollama
-import tiktoken
+import time
+import socket
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from business.llm import LlmClient
+from business.chunker import Chunker
+from business.writer import MemoryWriter
+from business import structured
+from business.structured import InsightReport, StructuredOutputError, ThemeAnalysis
+from models_bio.themes import merge_memories
 from business.handle_db import HandlerDatabase
 
 from logs import config as save
 log = save.setup_logs('orchestrator_debug.txt')
 
 
-class BioInsightPipeline:
-    def __init__(self):
-        self.handle = HandlerDatabase()
+class PipelineError(Exception):
+    """A stage finished without any valid output"""
+    pass
 
-    def run(self):
-        docs = self.handle.call("get_documents", limit=5)
-        log.info(f"🚀 Starting LLM interpretation pipeline for {len(docs)} documents")
-
-        for doc in docs:
-            log.info(f"🧩 Processing {doc.id} - {doc.title}")
-            log.debug(f"Document length: {len(doc.text_extratect)} characters")
 
-            # === Stage 1: Scientific interpretation (Qwen) ===
-            qwen_id = self.handle.call(
-                "insert_llm_pipeline",
-                publication_id=doc.id,
-                stage="qwen_analysis",
-                status="running"
-            )
-            log.info(f"🧠 [Qwen] Stage started for publication {doc.id}")
-            qwen_output = self.process_qwen(doc.text_extratect, qwen_id)
-            log.info(f"✅ [Qwen] Analysis complete for {doc.title}")
-            self.handle.call(
-                "insert_llm_pipeline",
-                publication_id=doc.id,
-                stage="qwen_analysis",
-                result_json=qwen_output,
-                status="success"
-            )
-
-            # === Stage 2: Analytical insights(Llama) ===
-            llama_id = self.handle.call(
-                "insert_llm_pipeline",
-                publication_id=doc.id,
-                stage="llama_insight",
-                status="running"
-            )
-            log.info(f"📊 [Llama] Generating high-level insights for {doc.title}")
-            llama_output = self.process_llama(qwen_output, llama_id)
-            log.info(f"✅ [Llama] Insight synthesis complete for {doc.title}")
-            self.handle.call(
-                "insert_llm_pipeline",
-                publication_id=doc.id,
-                stage="llama_insight",
-                result_json=llama_output,
-                status="success"
-            )
-            log.info("🏁 LLM pipeline completed for all documents.")
-
-    def chunk_text(self, text: str, max_tokens: int = 700):
-        """Divide the text into chunks with a token limit"""
-        enc = tiktoken.get_encoding("cl100k_base")
-        tokens = enc.encode(text)
-        chunks = []
-        for i in range(0, len(tokens), max_tokens):
-            chunk_tokens = tokens[i:i + max_tokens]
-            chunk_text = enc.decode(chunk_tokens)
-            chunks.append(chunk_text)
-        return chunks
-
-    def process_qwen(self, text, pipeline_id):
-        """Use Qwen as a space biologist"""
-        system = """
+class BioInsightPipeline:
+    QWEN_MODEL = "qwen2.5:7b-instruct-q4_0"
+    LLAMA_MODEL = "llama3:8b"
+    QWEN_MODES = ("sequential", "map_reduce")
+    NO_PREVIOUS = "No previous themes available."
+    QWEN_SYSTEM = """
         You are a senior space biologist with extensive expertise in the effects of space environments on biological systems. Your role is to deeply analyze scientific documents on space biology, 
         identifying key themes without prior knowledge of the document's structure. 
         Themes should emerge organically from the content, such as examples: (microgravity impacts on cellular processes,
@@ -90,15 +46,14 @@ class BioInsightPipeline:
         Output must be scientifically rigorous and structured in JSON.
         """
 
-        content_template = """
+    QWEN_PROMPT = """
         Analyze this chunk of the scientific document on space biology. Define main themes emerging from the text (e.g., microgravity-induced bone density loss, radiation-triggered cellular mutations, sex-specific metabolic adaptations). For each theme:
         - Extract important points and impactful discoveries, citing specific mechanisms or findings from the text.
         - Identify cause-effect correlations (e.g., reduced gravity causes decreased osteoblast activity leading to bone resorption).
         - Deduce potential cascade effects (e.g., bone loss cascades into increased fracture risk, compromising mission safety and post-flight recovery).
         - Highlight interesting observations for future research, including potential lacunas, areas of consensus or disagreement with existing literature, and actionable hypotheses for space missions.
 
-        Integrate and refine themes from previous chunks to build a cohesive understanding. Analyze this chunk of text from a scientific document on space biology: {previous_themes}.
-
+        {previous}
         For each theme:
             - Extract important points and discoveries.
             - Identify cause-effect correlations.
@@ -125,103 +80,350 @@ class BioInsightPipeline:
         Chunk: {chunk}
         """
 
+    QWEN_PREVIOUS = """Integrate and refine themes from previous chunks to build a cohesive understanding. Analyze this chunk of text from a scientific document on space biology: {previous_themes}.
+"""
+
+
+    # system = """
+    # You are a senior space biologist. Your task is to analyze scientific documents on space biology, identifying key themes and insights.
+    # Output must be strictly valid JSON, following the structure: points, cause_effects, cascade_effects, observations, impactful.
+    # Do NOT include explanations, text, or markdown outside the JSON.
+    # Focus on capturing all relevant scientific insights.
+    # """
+
+    # content_template = """
+    # Analyze the following chunk of a scientific document on space biology.
+
+    # Previous accumulated themes: {previous_themes}
+
+    # Instructions:
+    # - Identify main themes emerging from the text.
+    # - For each theme, extract:
+    # - points: important findings
+    # - cause_effects: cause -> effect relationships
+    # - cascade_effects: downstream consequences
+    # - observations: notes for future research or interesting phenomena
+    # - impactful: insights with high significance or implications
+
+    # Ensure:
+    # - Themes emerge from the text itself, do NOT invent them.
+    # - JSON output must match exactly the following structure:
+
+    # {{
+    # "themes": {{
+    #     "theme_name": {{
+    #     "points": ["..."],
+    #     "cause_effects": ["..."],
+    #     "cascade_effects": ["..."],
+    #     "observations": ["..."],
+    #     "impactful": ["..."]
+    #     }},
+    #     ...
+    # }}
+    # }}
+
+    # Text chunk:
+    # {chunk}
+    # """
+
+    QWEN_CONSOLIDATE = """
+        Below are the themes a space biologist extracted independently from each chunk of the same scientific document.
+        Consolidate them into one cohesive analysis of the whole document:
+        - Merge themes that describe the same subject under different names, keeping the clearest name.
+        - Keep every distinct point, cause-effect, cascade effect, observation and impactful insight; drop only exact repetitions.
+        - Do not invent content that is not present in the themes.
+
+        Output strictly in valid JSON without additional text, with the same structure:
+        {{
+            "themes": {{
+                "theme_name": {{
+                    "points": [...],
+                    "cause_effects": [...],
+                    "cascade_effects": [...],
+                    "observations": [...],
+                    "impactful": [...]
+                }}
+            }}
+        }}
 
-        # system = """
-        # You are a senior space biologist. Your task is to analyze scientific documents on space biology, identifying key themes and insights.
-        # Output must be strictly valid JSON, following the structure: points, cause_effects, cascade_effects, observations, impactful.
-        # Do NOT include explanations, text, or markdown outside the JSON.
-        # Focus on capturing all relevant scientific insights.
-        # """
-
-        # content_template = """
-        # Analyze the following chunk of a scientific document on space biology.
-
-        # Previous accumulated themes: {previous_themes}
-
-        # Instructions:
-        # - Identify main themes emerging from the text.
-        # - For each theme, extract:
-        # - points: important findings
-        # - cause_effects: cause -> effect relationships
-        # - cascade_effects: downstream consequences
-        # - observations: notes for future research or interesting phenomena
-        # - impactful: insights with high significance or implications
-
-        # Ensure:
-        # - Themes emerge from the text itself, do NOT invent them.
-        # - JSON output must match exactly the following structure:
-
-        # {{
-        # "themes": {{
-        #     "theme_name": {{
-        #     "points": ["..."],
-        #     "cause_effects": ["..."],
-        #     "cascade_effects": ["..."],
-        #     "observations": ["..."],
-        #     "impactful": ["..."]
-        #     }},
-        #     ...
-        # }}
-        # }}
-
-        # Text chunk:
-        # {chunk}
-        # """
+        Chunk themes: {themes}
+        """
 
-        chunks = self.chunk_text(text)
-        accumulated_themes = {}
+    def __init__(self, llm: LlmClient = None, qwen_mode: str = "sequential", consolidate: bool = False, chunk_workers: int = 4,
+                 chunker: Chunker = None, stream: bool = False, memory_batch: int = 8):
+        """
+        Args:
+            llm (LlmClient): shared Ollama client, one is created when missing
+            chunker (Chunker): how texts are split, legacy 700-token windows by default
+            stream (bool): stream the answers and stop reading once the JSON object closes
+            memory_batch (int): qwen chunk memories written per transaction
+            qwen_mode (str): "sequential" feeds the accumulated themes to every chunk,
+                "map_reduce" analyses the chunks independently and in parallel
+            consolidate (bool): in map_reduce, merge the chunk themes with one extra qwen call
+            chunk_workers (int): chunks of one document sent at once in map_reduce
+        """
+        if qwen_mode not in self.QWEN_MODES:
+            raise ValueError(f"Unknown qwen mode '{qwen_mode}', use one of {self.QWEN_MODES}")
+        self.handle = HandlerDatabase()
+        self.llm = llm or LlmClient()
+        self.qwen_mode = qwen_mode
+        self.consolidate = consolidate
+        self.chunk_workers = max(chunk_workers, 1)
+        self.chunker = chunker or Chunker()
+        self.stream = stream
+        self.memory_batch = memory_batch
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+
+    def run(self, limit=5):
+        """Returns the ids of the documents processed without error"""
+        docs = self.handle.call("get_documents", limit=limit, columns=("id", "title", "text_extratect"))
+        log.info(f"🚀 Starting LLM interpretation pipeline for {len(docs)} documents")
 
-        for i, chunk in enumerate(chunks):
-            log.info(f"🔬 [Qwen] Processing chunk {i+1}/{len(chunks)} ({len(chunk)} chars)")
-            prev_context = self.handle.call(
-                "get_last_llm_memory",
-                pipeline_id=pipeline_id,
-                model_name="qwen"
+        succeeded = []
+        for doc in docs:
+            try:
+                self.process_document(doc)
+                succeeded.append(doc.id)
+            except Exception as e:
+                log.error(f"❌ Pipeline failed for publication {doc.id}: {e}")
+        log.info("🏁 LLM pipeline completed for all documents.")
+        return succeeded
+
+    def run_queue(self, limit=None, batch=1):
+        """Work-queue mode: process only publications never analysed or whose
+        text changed, claimed atomically so several executors can share the work.
+        Returns the ids of the documents processed without error"""
+        log.info(f"🚀 Worker {self.worker} consuming the LLM queue")
+        processed = 0
+        succeeded = []
+        while limit is None or processed < limit:
+            size = batch if limit is None else min(batch, limit - processed)
+            docs = self.claim(size)
+            if not docs:
+                break
+            for doc in docs:
+                try:
+                    self.process_claimed(doc)
+                    succeeded.append(doc.id)
+                except Exception as e:
+                    log.error(f"❌ Pipeline failed for publication {doc.id}: {e}")
+                processed += 1
+        log.info(f"🏁 Queue drained by {self.worker}: {processed} documents")
+        return succeeded
+
+    def claim(self, limit):
+        return self.handle.call("claim_publications", worker=self.worker, limit=limit)
+
+    def process_claimed(self, doc):
+        """A failed document keeps its claim, so it is retried only after the lease.
+        Its failed stage has no success row, which keeps it claimable then"""
+        self.process_document(doc)
+        self.handle.call("release_claim", publication_id=doc.id, worker=self.worker)
+
+    @staticmethod
+    def text_hash(text):
+        """Same value as md5(text_extratect) in Postgres"""
+        return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+    def process_document(self, doc):
+        """Run both stages (Qwen then Llama) for a single publication.
+        A Qwen analysis that already succeeded over the same text is reused,
+        so a document back from the queue after a Llama failure only runs Llama"""
+        log.info(f"🧩 Processing {doc.id} - {doc.title}")
+        log.debug(f"Document length: {len(doc.text_extratect)} characters")
+        text_hash = self.text_hash(doc.text_extratect)
+
+        # === Stage 1: Scientific interpretation (Qwen) ===
+        completed = self.handle.call(
+            "get_completed_pipeline",
+            publication_id=doc.id,
+            stage="qwen_analysis",
+            text_hash=text_hash
+        )
+        if completed is not None and completed.result_json:
+            log.info(f"♻️ [Qwen] Publication {doc.id} already analysed by pipeline {completed.id}, skipping to Llama")
+            qwen_output = completed.result_json
+        else:
+            qwen_output = self.qwen_stage(doc, text_hash)
+
+        # === Stage 2: Analytical insights(Llama) ===
+        llama_id = self.handle.call(
+            "insert_llm_pipeline",
+            publication_id=doc.id,
+            stage="llama_insight",
+            status="running",
+            text_hash=text_hash
+        )
+        log.info(f"📊 [Llama] Generating high-level insights for {doc.title}")
+        try:
+            llama_output = self.process_llama(qwen_output, llama_id)
+        except Exception as e:
+            self.handle.call("update_llm_pipeline", pipeline_id=llama_id, status="failed", message=str(e))
+            raise
+        log.info(f"✅ [Llama] Insight synthesis complete for {doc.title}")
+        self.handle.call("update_llm_pipeline", pipeline_id=llama_id, status="success", result_json=llama_output)
+
+    def qwen_stage(self, doc, text_hash):
+        """Run, or resume, the Qwen analysis of a document and store its merged themes"""
+        qwen_id = self.handle.call(
+            "get_resumable_pipeline",
+            publication_id=doc.id,
+            stage="qwen_analysis",
+            text_hash=text_hash
+        )
+        done = {}
+        if qwen_id is not None:
+            done = self.handle.call("get_chunk_memories", pipeline_id=qwen_id, model_name="qwen")
+            log.info(f"♻️ [Qwen] Resuming pipeline {qwen_id} of publication {doc.id} with {len(done)} stored chunks")
+        else:
+            qwen_id = self.handle.call(
+                "insert_llm_pipeline",
+                publication_id=doc.id,
+                stage="qwen_analysis",
+                status="running",
+                text_hash=text_hash
             )
+        log.info(f"🧠 [Qwen] Stage started for publication {doc.id} ({self.qwen_mode})")
+        start = time.perf_counter()
+        try:
+            qwen_output = self.process_qwen(doc.text_extratect, qwen_id, publication_id=doc.id, done=done)
+        except Exception as e:
+            self.handle.call("update_llm_pipeline", pipeline_id=qwen_id, status="failed", message=str(e))
+            raise
+        log.info(f"✅ [Qwen] Analysis complete for {doc.title} in {time.perf_counter() - start:.1f}s ({self.qwen_mode})")
+        # consolidated themes exist only in qwen_output, the memories hold the chunk ones
+        consolidated = qwen_output["themes"] if self.qwen_mode == "map_reduce" and self.consolidate else None
+        self.handle.call("save_merged_themes", publication_id=doc.id, themes=consolidated, pipeline_id=qwen_id)
+        self.handle.call("update_llm_pipeline", pipeline_id=qwen_id, status="success", result_json=qwen_output)
+        return qwen_output
+
+    def chunk_text(self, text: str, max_tokens: int = None):
+        """Divide the text into chunks with a token limit, the chunker's own by default"""
+        chunker = self.chunker if max_tokens in (None, self.chunker.max_tokens) else Chunker(
+            max_tokens=max_tokens, overlap=self.chunker.overlap, mode=self.chunker.mode
+        )
+        chunks = chunker.chunk(text)
+        log.debug(f"Chunks ({chunker.mode}): {[chunk['tokens'] for chunk in chunks]} tokens")
+        return [chunk["text"] for chunk in chunks]
+
+    def process_qwen(self, text, pipeline_id, publication_id=None, done=None):
+        """Use Qwen as a space biologist; chunk memories are written in
+        batches and folded into the publication's merged themes as they go.
+        `done` holds the memories of an interrupted run by chunk_index,
+        those chunks are not sent again"""
+        chunks = self.chunk_text(text)
+        with MemoryWriter(self.handle, pipeline_id, publication_id, batch_size=self.memory_batch) as writer:
+            if self.qwen_mode == "map_reduce":
+                return self.process_qwen_map_reduce(chunks, writer, done or {})
+            return self.process_qwen_sequential(chunks, writer, done or {})
+
+    def analyse_chunk(self, chunk, previous_themes=None):
+        """Ask Qwen about one chunk, validated against the ThemeAnalysis schema.
+        Without `previous_themes` (map_reduce) the prompt has no clause about them"""
+        previous = self.QWEN_PREVIOUS.format(previous_themes=previous_themes) if previous_themes is not None else ""
+        user_content = self.QWEN_PROMPT.format(previous=previous, chunk=chunk)
+        messages = [
+            {"role": "system", "content": self.QWEN_SYSTEM},
+            {"role": "user", "content": user_content}
+        ]
+        data = structured.chat(self.llm, self.QWEN_MODEL, messages, ThemeAnalysis, stream=self.stream)
+        log.info(f"Response QWWEN Cientific: {data}")
+        return data
+
+    @staticmethod
+    def accumulate(accumulated_themes, data):
+        for theme, details in data.get("themes", {}).items():
+            if theme not in accumulated_themes:
+                accumulated_themes[theme] = details
+            else:
+                for key, values in details.items():
+                    if key in accumulated_themes[theme]:
+                        accumulated_themes[theme][key].extend([v for v in values if v not in accumulated_themes[theme][key]])
+                    else:
+                        accumulated_themes[theme][key] = values
 
-            previous_themes = json.dumps(accumulated_themes, indent=2) if accumulated_themes else "No previous themes available."
-            user_content = content_template.format(previous_themes=previous_themes, chunk=chunk)
-            messages = [
-                {"role": "system", "content": system},
-                {"role": "user", "content": user_content}
-            ]
+    def process_qwen_sequential(self, chunks, writer: MemoryWriter, done=None):
+        """Original mode: every chunk sees the themes accumulated so far.
+        On resume the stored chunks are replayed to rebuild them and the
+        analysis continues after the last stored chunk_index"""
+        accumulated_themes = {}
+        done = done or {}
+        for i in sorted(done):
+            self.accumulate(accumulated_themes, done[i])
+        first = max(done) + 1 if done else 0
+        analysed = len(done)
 
+        for i, chunk in enumerate(chunks[first:], start=first):
+            log.info(f"🔬 [Qwen] Processing chunk {i+1}/{len(chunks)} ({len(chunk)} chars)")
+            previous_themes = json.dumps(accumulated_themes, indent=2) if accumulated_themes else self.NO_PREVIOUS
             try:
-                response = ollama.chat(model="qwen2.5:7b-instruct-q4_0", messages=messages)
-                raw_content = response.get("message", {}).get("content", "").strip()
-                log.info(f"Response QWWEN Cientific: {response}")
-
-                if raw_content.startswith("```json"):
-                    raw_content = raw_content.removeprefix("```json").removesuffix("```").strip()
-                elif raw_content.startswith("```"):
-                    raw_content = raw_content.removeprefix("```").removesuffix("```").strip()
-
-                try:
-                    data = json.loads(raw_content)
-                except json.JSONDecodeError:
-                    log.warning(f"⚠️ Chunk {i}: JSON parse failed. Attempting cleanup...")
-                    raw_content = raw_content.split("```")[0].strip()
-                    data = json.loads(raw_content)
-
-                for theme, details in data.get("themes", {}).items():
-                    if theme not in accumulated_themes:
-                        accumulated_themes[theme] = details
-                    else:
-                        for key, values in details.items():
-                            if key in accumulated_themes[theme]:
-                                accumulated_themes[theme][key].extend([v for v in values if v not in accumulated_themes[theme][key]])
-                            else:
-                                accumulated_themes[theme][key] = values
-                self.handle.call("insert_llm_memory", pipeline_id=pipeline_id, model_name="qwen", chunk_index=i, context_json=data)
+                data = self.analyse_chunk(chunk, previous_themes)
+                self.accumulate(accumulated_themes, data)
+                writer.add("qwen", i, data)
+                analysed += 1
                 log.info(f"✅ [Qwen] Chunk {i+1}/{len(chunks)} processed successfully")
-            except json.JSONDecodeError:
-                log.warning(f"Invalid response from Qwen in the chunk: {i}")
+            except StructuredOutputError as e:
+                log.warning(f"Invalid response from Qwen in the chunk {i}: {e}")
             except Exception as e:
                 log.error(f"Error processing Qwen chunk {i}: {e}")
 
+        if not analysed:
+            raise PipelineError(f"None of the {len(chunks)} chunks got a valid Qwen answer")
         log.info(f"🧠 [Qwen] Total accumulated themes: {len(accumulated_themes)}")
         return {"themes": accumulated_themes}
 
+    def process_qwen_map_reduce(self, chunks, writer: MemoryWriter, done=None):
+        """Map: every chunk is analysed on its own, several at once.
+        Reduce: the chunk themes are merged in chunk order, or consolidated
+        by one more Qwen call when `consolidate` is set. On resume only the
+        chunks without a stored memory are analysed"""
+        results = dict(done or {})
+        with ThreadPoolExecutor(max_workers=self.chunk_workers) as executor:
+            futures = {
+                executor.submit(self.analyse_chunk, chunk): i
+                for i, chunk in enumerate(chunks) if i not in results
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                    writer.add("qwen", i, results[i])
+                    log.info(f"✅ [Qwen] Chunk {i+1}/{len(chunks)} processed successfully")
+                except StructuredOutputError as e:
+                    log.warning(f"Invalid response from Qwen in the chunk {i}: {e}")
+                except Exception as e:
+                    log.error(f"Error processing Qwen chunk {i}: {e}")
+
+        if not results:
+            raise PipelineError(f"None of the {len(chunks)} chunks got a valid Qwen answer")
+        memories = [results[i] for i in sorted(results)]
+        themes, _, _ = merge_memories(memories)
+        if self.consolidate and themes:
+            consolidated = self.consolidate_themes(themes)
+            if consolidated is not None:
+                themes = consolidated
+
+        log.info(f"🧠 [Qwen] Total reduced themes: {len(themes)} from {len(memories)}/{len(chunks)} chunks")
+        return {"themes": themes}
+
+    def consolidate_themes(self, themes):
+        """One Qwen call merging synonymous themes; None keeps the deterministic merge"""
+        messages = [
+            {"role": "system", "content": self.QWEN_SYSTEM},
+            {"role": "user", "content": self.QWEN_CONSOLIDATE.format(themes=json.dumps(themes, ensure_ascii=False))}
+        ]
+        try:
+            data = structured.chat(self.llm, self.QWEN_MODEL, messages, ThemeAnalysis, stream=self.stream)
+            if data["themes"]:
+                log.info(f"🧠 [Qwen] Consolidated {len(themes)} themes into {len(data['themes'])}")
+                return data["themes"]
+            log.warning("Consolidation answer has no themes, keeping the merged chunk themes")
+        except StructuredOutputError as e:
+            log.warning(f"Invalid consolidation response from Qwen, keeping the merged chunk themes: {e}")
+        except Exception as e:
+            log.error(f"Error consolidating Qwen themes: {e}")
+        return None
+
     def process_llama(self, qwen_data, pipeline_id):
         """Usa o Llama como analista de dados sênior"""
         system = """
@@ -257,16 +459,15 @@ class BioInsightPipeline:
         ]
         try:
             log.info("📡 [Llama] Starting synthesis phase")
-            response = ollama.chat(model="llama3:8b", messages=messages)
-            raw = response["message"]["content"].strip()
-            if not raw.endswith("}"):
-                raw += "}"
-            data = json.loads(raw)
-            log.info(f"Response LLAMA Analisys: {response}")
+            data = structured.chat(self.llm, self.LLAMA_MODEL, messages, InsightReport, stream=self.stream)
+            log.info(f"Response LLAMA Analisys: {data}")
             self.handle.call("insert_llm_memory", pipeline_id=pipeline_id, model_name="llama", chunk_index=0, context_json=data)
             log.info("✅ [Llama] Insight synthesis complete")
             return data
-        except json.JSONDecodeError:
-            log.warning("Invalid response from Llama")
+        except StructuredOutputError as e:
+            # re-raised so process_document marks the row failed and the queue retries it
+            log.warning(f"Invalid response from Llama: {e}")
+            raise
         except Exception as e:
-            log.error(f"Error processing Llama: {e}")
\ No newline at end of file
+            log.error(f"Error processing Llama: {e}")
+            raise
\ No newline at end of file
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+import os
+import sys
+import time
+from typing import Dict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from business.orch import BioInsightPipeline
+
+from logs import config as save
+log = save.setup_logs('orchestrator_debug.txt')
+
+
+class PipelineScheduler():
+    """Runs several publications through BioInsightPipeline at once.
+
+    Every worker takes one document from qwen to llama, so while a worker
+    is in the llama stage of document A another one is already sending the
+    qwen chunks of document B. How many calls reach each model at the same
+    time is bounded by the LlmClient limits, not by the number of workers.
+    """
+
+    def __init__(self, pipeline: BioInsightPipeline, workers: int = 2):
+        self.pipeline = pipeline
+        self.workers = max(workers, 1)
+
+    def run(self, limit: int = 5) -> Dict:
+        """Process up to `limit` documents, a failure only stops its own document
+
+        Returns:
+            summary (Dict): processed and failed ids and the elapsed seconds
+        """
+        docs = self.pipeline.handle.call("get_documents", limit=limit, columns=("id", "title", "text_extratect"))
+        log.info(f"🚀 Scheduling {len(docs)} documents on {self.workers} workers")
+
+        summary = {"processed": [], "failed": [], "seconds": 0.0}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.pipeline.process_document, doc): doc for doc in docs}
+            self.collect(futures, summary)
+        return self.finish(summary, start)
+
+    def run_queue(self, limit: int = None) -> Dict:
+        """Work-queue mode: keep every worker busy, claiming one more publication each
+        time a document finishes, until a claim comes back empty or `limit` documents were taken"""
+        log.info(f"🚀 Worker {self.pipeline.worker} consuming the LLM queue on {self.workers} threads")
+
+        summary = {"processed": [], "failed": [], "seconds": 0.0}
+        start = time.perf_counter()
+        claimed = 0
+        futures = {}
+        empty = False
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                size = self.workers - len(futures)
+                if limit is not None:
+                    size = min(size, limit - claimed)
+                if size > 0 and not empty:
+                    docs = self.pipeline.claim(size)
+                    empty = not docs
+                    claimed += len(docs)
+                    futures.update({executor.submit(self.pipeline.process_claimed, doc): doc for doc in docs})
+                if not futures:
+                    break
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.record(future, futures.pop(future), summary)
+        return self.finish(summary, start)
+
+    @classmethod
+    def collect(cls, futures: Dict, summary: Dict):
+        for future in as_completed(futures):
+            cls.record(future, futures[future], summary)
+
+    @staticmethod
+    def record(future, doc, summary: Dict):
+        try:
+            future.result()
+            summary["processed"].append(doc.id)
+        except Exception as e:
+            log.error(f"❌ Pipeline failed for publication {doc.id}: {e}")
+            summary["failed"].append(doc.id)
+
+    @staticmethod
+    def finish(summary: Dict, start: float) -> Dict:
+        summary["seconds"] = round(time.perf_counter() - start, 2)
+        log.info(
+            f"🏁 Scheduler finished: {len(summary['processed'])} processed, "
+            f"{len(summary['failed'])} failed in {summary['seconds']}s"
+        )
+        return summary
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+import os
+import re
+import sys
+import json
+import threading
+from typing import Any, Dict, List, Type
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+from logs import config as save
+log = save.setup_logs('orchestrator_debug.txt')
+
+
+class StructuredOutputError(Exception):
+    """The model answer could not be turned into the expected JSON"""
+    pass
+
+
+def _as_strings(value: Any) -> List[str]:
+    """The prompts ask for lists of strings, but models also answer with a bare
+    string or objects; keep them instead of failing the whole chunk"""
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        value = [value]
+    return [item if isinstance(item, str) else json.dumps(item, ensure_ascii=False) for item in value]
+
+
+class ThemeDetails(BaseModel):
+    points: List[str] = Field(default_factory=list)
+    cause_effects: List[str] = Field(default_factory=list)
+    cascade_effects: List[str] = Field(default_factory=list)
+    observations: List[str] = Field(default_factory=list)
+    impactful: List[str] = Field(default_factory=list)
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def strings(cls, value):
+        return _as_strings(value)
+
+
+class ThemeAnalysis(BaseModel):
+    """qwen answer for a chunk, the shape stored in nasa.llm_memory"""
+    themes: Dict[str, ThemeDetails]
+
+
+class Insight(BaseModel):
+    category: str
+    details: List[str] = Field(default_factory=list)
+
+    @field_validator("details", mode="before")
+    @classmethod
+    def strings(cls, value):
+        return _as_strings(value)
+
+
+class InsightReport(BaseModel):
+    """llama synthesis of a publication"""
+    insights: List[Insight]
+    impressive_summary: str = ""
+
+
+class JsonStream():
+    """Incremental scanner of the first top-level JSON object in a text.
+
+    Fed piece by piece as the answer streams in, it follows strings,
+    escapes and nesting, so it knows when the object is complete and,
+    if the answer is cut short, which closers are still missing.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.stack = []
+        self.started = False
+        self.complete = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, piece: str) -> bool:
+        """Consume the next piece of the answer; True once the object is closed"""
+        for char in piece:
+            if self.complete:
+                break
+            if not self.started:
+                if char != "{":
+                    continue
+                self.started = True
+            self.buffer.append(char)
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.stack.append("}" if char == "{" else "]")
+            elif char in "}]" and self.stack:
+                self.stack.pop()
+                self.complete = not self.stack
+        return self.complete
+
+    @property
+    def text(self) -> str:
+        return "".join(self.buffer)
+
+    def closed(self) -> str:
+        """The text with an open string, a dangling key and the missing closers fixed"""
+        text = self.text
+        if self.in_string:
+            text = (text[:-1] if self.escaped else text) + '"'
+        text = text.rstrip()
+        if self.stack and self.stack[-1] == "}":
+            text = DANGLING_KEY.sub("", text)
+        text = DANGLING_SEPARATOR.sub("", text)
+        return text + "".join(reversed(self.stack))
+
+
+DANGLING_KEY = re.compile(r'(?<=[{,])\s*"(?:[^"\\]|\\.)*"\s*:?\s*$')
+DANGLING_SEPARATOR = re.compile(r"[,:]\s*$")
+TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+
+class ParseMetrics():
+    """Counters of how model answers were parsed, by schema"""
+    OUTCOMES = ("direct", "repaired", "invalid_json", "invalid_schema")
+
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def record(self, schema: str, outcome: str):
+        with self.lock:
+            counts = self.counts.setdefault(schema, dict.fromkeys(self.OUTCOMES, 0))
+            counts[outcome] += 1
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            report = {}
+            for schema, counts in self.counts.items():
+                total = sum(counts.values())
+                failed = counts["invalid_json"] + counts["invalid_schema"]
+                report[schema] = dict(counts, total=total, failure_rate=round(failed / total, 3) if total else 0.0)
+            return report
+
+
+METRICS = ParseMetrics()
+
+
+def repair(raw: str, max_closers: int = 16) -> str:
+    """Bounded repair of a model answer: drop fences and prose around the
+    object, trailing commas, and close a truncated object with at most
+    `max_closers` brackets"""
+    stream = JsonStream()
+    stream.feed(raw)
+    if not stream.started:
+        raise StructuredOutputError("No JSON object in the answer")
+    if stream.complete:
+        text = stream.text
+    elif len(stream.stack) <= max_closers:
+        text = stream.closed()
+    else:
+        raise StructuredOutputError(f"Answer truncated {len(stream.stack)} levels deep")
+    return TRAILING_COMMA.sub(r"\1", text)
+
+
+def parse(raw: str, schema: Type[BaseModel], metrics: ParseMetrics = METRICS) -> Dict:
+    """Parse and validate an answer against `schema`, repairing it if needed
+
+    Returns:
+        data (Dict): the validated answer, as plain JSON types
+    """
+    name = schema.__name__
+    outcome = "direct"
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        outcome = "repaired"
+        try:
+            data = json.loads(repair(raw))
+        except (json.JSONDecodeError, StructuredOutputError) as e:
+            metrics.record(name, "invalid_json")
+            raise StructuredOutputError(f"{name}: invalid JSON after repair: {e}") from e
+
+    try:
+        validated = schema.model_validate(data)
+    except ValidationError as e:
+        metrics.record(name, "invalid_schema")
+        raise StructuredOutputError(f"{name}: {e.error_count()} schema errors") from e
+
+    metrics.record(name, outcome)
+    if outcome == "repaired":
+        log.warning(f"⚠️ {name}: answer repaired before parsing")
+    return validated.model_dump(mode="json")
+
+
+def chat(llm, model: str, messages: List[Dict], schema: Type[BaseModel], stream: bool = False, **kwargs) -> Dict:
+    """Ask `model` for JSON following `schema` (sent as Ollama's format)
+    and return the validated answer.
+
+    With `stream`, the answer is scanned while it arrives and reading stops
+    as soon as the top-level object is closed.
+    """
+    kwargs["format"] = schema.model_json_schema()
+    if not stream:
+        parsed = {}
+
+        def accept(response):
+            # parsed before the client caches the answer, invalid ones are never kept
+            parsed["data"] = parse(response["message"]["content"].strip(), schema)
+
+        llm.chat(model=model, messages=messages, accept=accept, **kwargs)
+        return parsed["data"]
+
+    scanner, pieces = JsonStream(), []
+    parts = llm.chat(model=model, messages=messages, stream=True, **kwargs)
+    try:
+        for part in parts:
+            piece = part["message"]["content"]
+            pieces.append(piece)
+            if scanner.feed(piece):
+                break
+    finally:
+        parts.close()
+    return parse(scanner.text if scanner.complete else "".join(pieces).strip(), schema)
@@ -0,0 +1,164 @@
+# -*- coding:utf-8 -*-
+
+# Autor: Yury
+# Data: 18/10/2026
+
+"""Local stand-in for the Ollama chat API, used to exercise the LLM scheduler.
+
+    python business/test/fake_ollama.py --port 11500 --latency 0.5
+    OLLAMA_HOST=http://127.0.0.1:11500 python main/executor.py --workers 4 --qwen-parallel 2
+
+Every few seconds it logs the peak number of simultaneous requests per
+model, which should never exceed the --qwen-parallel / --llama-parallel
+limits given to the executor.
+"""
+
+import json
+import time
+import logging
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+QWEN_ANSWER = {
+    "themes": {
+        "microgravity bone loss": {
+            "points": ["reduced osteoblast activity"],
+            "cause_effects": ["unloading -> bone resorption"],
+            "cascade_effects": ["bone loss -> fracture risk"],
+            "observations": ["countermeasures need long-duration data"],
+            "impactful": ["loss rates of 1% per month"]
+        }
+    }
+}
+
+LLAMA_ANSWER = {
+    "insights": [
+        {"category": "progress", "details": ["bone loss mechanisms are well described"]},
+        {"category": "gaps", "details": ["few female subjects"]}
+    ],
+    "impressive_summary": "Stand-in synthesis."
+}
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    latency = 0.5
+    runaway = 0
+    invalid = set()
+    active = Counter()
+    peak = Counter()
+    calls = Counter()
+    lock = threading.Lock()
+
+    def do_POST(self):
+        if self.path != "/api/chat":
+            self.send_error(404, "only /api/chat is served")
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        model = body.get("model", "")
+        with self.lock:
+            self.active[model] += 1
+            self.calls[model] += 1
+            self.peak[model] = max(self.peak[model], self.active[model])
+
+        try:
+            time.sleep(self.latency)
+            answer = QWEN_ANSWER if model.startswith("qwen") else LLAMA_ANSWER
+            content = json.dumps(answer)
+            if any(model.startswith(prefix) for prefix in self.invalid):
+                # a model that ignores the format, answers that no repair can save
+                content = "Sorry, I can only summarise this document in prose."
+            if body.get("stream", True):
+                self.send_stream(model, content)
+            else:
+                self.send_json(self.message(model, content, done=True))
+        finally:
+            with self.lock:
+                self.active[model] -= 1
+
+    @staticmethod
+    def message(model: str, content: str, done: bool) -> dict:
+        message = {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": content},
+            "done": done,
+        }
+        if done:
+            message.update({
+                "done_reason": "stop",
+                "prompt_eval_count": 1,
+                "eval_count": max(len(content) // 4, 1),
+                "load_duration": 0,
+                "prompt_eval_duration": 10_000_000,
+                "eval_duration": 50_000_000,
+            })
+        return message
+
+    def send_json(self, data: dict):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_stream(self, model: str, content: str):
+        """NDJSON chunks like the real server, a few characters per line"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for start in range(0, len(content), 16):
+            line = self.message(model, content[start:start + 16], done=False)
+            self.wfile.write(json.dumps(line).encode("utf-8") + b"\n")
+        try:
+            # a model that keeps talking after its JSON, to exercise the early stop
+            for _ in range(self.runaway):
+                time.sleep(0.05)
+                self.wfile.write(json.dumps(self.message(model, " and more", done=False)).encode("utf-8") + b"\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            logging.info(f"{model}: client stopped reading early")
+            return
+        self.wfile.write(json.dumps(self.message(model, "", done=True)).encode("utf-8") + b"\n")
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+
+def report():
+    """Log the calls and the peak concurrency seen for each model"""
+    while True:
+        time.sleep(5)
+        with FakeOllamaHandler.lock:
+            seen = [
+                f"{model}: {FakeOllamaHandler.calls[model]} calls, peak {FakeOllamaHandler.peak[model]}"
+                for model in sorted(FakeOllamaHandler.calls)
+            ]
+        if seen:
+            logging.info(" | ".join(seen))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer /api/chat with canned qwen and llama JSON")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before each answer")
+    parser.add_argument("--runaway", type=int, default=0, help="extra streamed pieces sent after the JSON")
+    parser.add_argument("--invalid", nargs="*", default=[], help="model prefixes (qwen, llama) answered without JSON")
+    args = parser.parse_args()
+
+    FakeOllamaHandler.latency = args.latency
+    FakeOllamaHandler.runaway = args.runaway
+    FakeOllamaHandler.invalid = set(args.invalid)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), FakeOllamaHandler)
+    threading.Thread(target=report, daemon=True).start()
+    logging.info(f"✅ Fake Ollama on http://127.0.0.1:{args.port}")
+    server.serve_forever()
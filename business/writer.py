@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+import os
+import sys
+import threading
+from typing import Dict
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from business.handle_db import HandlerDatabase
+
+from logs import config as save
+log = save.setup_logs('orchestrator_debug.txt')
+
+
+class MemoryWriter():
+    """Buffers the chunk memories of one pipeline run and writes them in batches.
+
+    Each flush is a single transaction: one multi-row INSERT into
+    nasa.llm_memory plus the theme counts and merged themes of the batch,
+    instead of two commits per chunk. Memories still in the buffer when a
+    run crashes are simply analysed again on resume.
+
+        with MemoryWriter(handle, pipeline_id, publication_id) as writer:
+            writer.add("qwen", chunk_index, data)
+    """
+
+    def __init__(self, handle: HandlerDatabase, pipeline_id: int, publication_id: int = None, batch_size: int = 8):
+        self.handle = handle
+        self.pipeline_id = pipeline_id
+        self.publication_id = publication_id
+        self.batch_size = max(batch_size, 1)
+        self.rows = []
+        self.written = 0
+        self.lock = threading.Lock()
+
+    def add(self, model_name: str, chunk_index: int, context_json: Dict):
+        with self.lock:
+            self.rows.append({
+                "pipeline_id": self.pipeline_id,
+                "model_name": model_name,
+                "chunk_index": chunk_index,
+                "context_json": context_json,
+            })
+            if len(self.rows) >= self.batch_size:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if not self.rows:
+            return
+        # rows stay buffered if the write fails, the next flush retries them
+        self.handle.call("insert_llm_memories", rows=self.rows, publication_id=self.publication_id)
+        self.written += len(self.rows)
+        log.debug(f"Flushed {len(self.rows)} memories of pipeline {self.pipeline_id}")
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        # keep what was analysed even when the run fails, it is reused on resume
+        self.flush()
+        return False
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+import re
+from typing import Dict, List
+
+from lxml import etree
+from bs4 import BeautifulSoup, Tag
+
+from logs import config as save
+log = save.setup_logs("scrapy_debug.txt")
+
+
+EXCLUDE_PATTERNS = [
+    "notes", "ack1", "ref", "contrib",
+    "fn", "Bib", "sec", "__ad", "founding"
+]
+
+
+class ExtractorErrors(Exception):
+    """Catches exceptions when separating the article from the HTML"""
+    pass
+
+
+def clean_text(data: str) -> str:
+    """Remove spaces and invisible characters
+
+    Args:
+        data (str): str containing texte doc extracted from html
+
+    Returns:
+        treated (str): text doc clean
+    """
+    text = re.sub(r"\s+", " ", data)
+    treated = text.replace("\xa0", " ")
+    return treated.strip()
+
+
+class SoupExtractor():
+    """Reference backend: BeautifulSoup tree and a Python scan of every tag"""
+    name = "soup"
+
+    def __init__(self, patterns: List[str] = EXCLUDE_PATTERNS):
+        self.patterns = patterns
+
+    def extract(self, raw_html: str) -> str:
+        soup = BeautifulSoup(raw_html, "lxml")
+
+        section = soup.find("section", attrs={"aria-label": "Article content"})
+        if not section:
+            raise ExtractorErrors("Section 'Article content' not found.")
+
+
+        for tag in list(section.find_all(True)):
+            try:
+                if not isinstance(tag, Tag):
+                    continue
+
+                id_attr = tag.get("id", "") or ""
+                class_attr = " ".join(tag.get("class", [])) if tag.get("class") else ""
+
+                if any(
+                    pat.lower() in id_attr.lower() or pat.lower() in class_attr.lower()
+                    for pat in self.patterns
+                ):
+                    tag.decompose()
+            except Exception as e:
+                log.warning(f"⚠️ Ignored invalid tag: {e}")
+                continue
+
+        footer = section.find("footer")
+        if footer:
+            footer.decompose()
+
+        return clean_text(section.get_text(separator="\n", strip=True))
+
+
+class LxmlExtractor():
+    """Fast backend: plain lxml tree walked once, without rebuilding it.
+
+    Excluded subtrees and the first footer are skipped while collecting the
+    text instead of being removed, and the id/class test is a single
+    precompiled regex. The output is the same as SoupExtractor, including
+    the strings BeautifulSoup leaves out of get_text (script, style,
+    template and ruby annotations) and the split around removed tags.
+    """
+    name = "lxml"
+    HIDDEN = frozenset(["script", "style", "template", "rt", "rp"])
+
+    def __init__(self, patterns: List[str] = EXCLUDE_PATTERNS):
+        self.exclude = re.compile("|".join(re.escape(pat.lower()) for pat in patterns))
+
+    @staticmethod
+    def find_section(root):
+        for section in root.iter("section"):
+            if section.get("aria-label") == "Article content":
+                return section
+        return None
+
+    def excluded(self, element) -> bool:
+        id_attr = element.get("id") or ""
+        class_attr = element.get("class") or ""
+        return bool(self.exclude.search(id_attr.lower()) or self.exclude.search(class_attr.lower()))
+
+    def collect(self, element, hidden: bool, strings: List[str], state: Dict):
+        """Gather the text below `element` in document order"""
+        if element.text and not hidden:
+            strings.append(element.text)
+
+        for child in element:
+            tag = child.tag
+            if isinstance(tag, str):
+                if self.excluded(child):
+                    pass
+                elif tag == "footer" and not state["footer"]:
+                    state["footer"] = True
+                else:
+                    self.collect(child, hidden or tag in self.HIDDEN, strings, state)
+            if child.tail and not hidden:
+                strings.append(child.tail)
+
+    def extract(self, raw_html: str) -> str:
+        parser = etree.HTMLParser()
+        try:
+            parser.feed(raw_html)
+            root = parser.close()
+        except etree.LxmlError:
+            root = None
+
+        section = self.find_section(root) if root is not None else None
+        if section is None:
+            raise ExtractorErrors("Section 'Article content' not found.")
+
+        hidden = any(ancestor.tag in self.HIDDEN for ancestor in section.iterancestors())
+        strings = []
+        self.collect(section, hidden, strings, {"footer": False})
+
+        # clean_text collapses every whitespace run, so joining with a space
+        # gives the same result as get_text(separator="\n", strip=True)
+        return clean_text(" ".join(strings))
+
+
+BACKENDS = {
+    SoupExtractor.name: SoupExtractor,
+    LxmlExtractor.name: LxmlExtractor,
+}
+
+
+def get_extractor(name: str = "lxml"):
+    """Build the extractor registered under `name`"""
+    if name not in BACKENDS:
+        raise ExtractorErrors(f"Unknown extractor '{name}', use one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
@@ -5,23 +5,51 @@
 
 import os
 import sys
+import argparse
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from scrapy import ScrapyDocs
 
-def init_scrapy():
+def init_scrapy(args: argparse.Namespace):
     """Function of the mechanism that interprets and triggers the scrapy
 
+    Args:
+        args (argparse.Namespace): options read from the command line
+
     Returns:
         status (str): in case no error is raised
     """
     # INITIALIZE SEARCH CLASS
-    extraction = ScrapyDocs()
+    extraction = ScrapyDocs(
+        max_workers=args.workers,
+        rate_per_host=args.rate,
+        burst_per_host=args.burst,
+        extractor=args.extractor,
+    )
+    if args.font:
+        extraction.font = args.font
 
     links = extraction.setup_search()
-    status = extraction.get_docs_html(search=links)
+    if args.incremental:
+        status, summary = extraction.get_docs_html_incremental(search=links)
+        return f"{status} {summary}"
+    if args.concurrent:
+        return extraction.get_docs_html_concurrent(search=links)
+    return extraction.get_docs_html(search=links)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Scrape the PMC publications listed in the CSV")
+    parser.add_argument("--concurrent", action="store_true", help="download several links at once")
+    parser.add_argument("--incremental", action="store_true", help="fetch only missing or failed publications")
+    parser.add_argument("--workers", type=int, default=None, help="threads of the concurrent crawl")
+    parser.add_argument("--rate", type=float, default=None, help="requests per second for each host")
+    parser.add_argument("--burst", type=int, default=None, help="requests a host may receive back to back")
+    parser.add_argument("--extractor", choices=["lxml", "soup"], default=None, help="HTML extraction backend")
+    parser.add_argument("--font", default=None, help="CSV with the Title and Link columns")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    init = init_scrapy()
-    print(f"FINALLY: {init}")
\ No newline at end of file
+    init = init_scrapy(parse_args())
+    print(f"FINALLY: {init}")
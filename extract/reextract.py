@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+import os
+import sys
+import time
+import argparse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from typing import Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+
+from business import handle_db
+from extract.extractors import ExtractorErrors, get_extractor
+from logs import config as save
+log = save.setup_logs("reextract_debug.txt")
+
+
+_extractor = None
+
+
+def init_worker(backend: str):
+    """Build the extractor once per worker process"""
+    global _extractor
+    _extractor = get_extractor(backend)
+
+
+def reextract_page(page: Tuple[int, str]) -> Tuple[int, Optional[str], Optional[str]]:
+    """Run the extractor over one stored page
+
+    Args:
+        page (Tuple[int, str]): publication id and raw_html
+
+    Returns:
+        result (Tuple): id, new text (None on failure) and the error message
+    """
+    pub_id, raw_html = page
+    try:
+        return pub_id, _extractor.extract(raw_html), None
+    except ExtractorErrors as errors:
+        return pub_id, None, str(errors)
+    except Exception as errors:
+        # raised out of pool.map it would abort the whole batch, not only this page
+        log.error(f"Unexpected error re-extracting publication {pub_id}: {errors}")
+        return pub_id, None, f"{type(errors).__name__}: {errors}"
+
+
+class ReExtraction():
+    """Rebuild text_extratect from the raw_html already stored, without crawling again"""
+    BATCH_SIZE = 200
+
+    def __init__(self, workers: int = None, backend: str = "lxml", batch_size: int = None):
+        self.workers = workers or os.cpu_count()
+        self.backend = backend
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.handle = handle_db.HandlerDatabase()
+
+    def run(self) -> dict:
+        """Stream the pages, parse them across the process pool and bulk update each batch
+
+        Returns:
+            summary (dict): number of publications updated and failed
+        """
+        summary = {"updated": 0, "failed": 0}
+        start = time.perf_counter()
+        log.info(f"🚀 Re-extracting with {self.workers} processes, backend {self.backend}")
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker, initargs=(self.backend,)) as pool:
+            for batch in self.handle.call("iter_raw_html", batch_size=self.batch_size):
+                chunksize = max(1, len(batch) // (self.workers * 4))
+                rows = []
+                for pub_id, text, error in pool.map(reextract_page, batch, chunksize=chunksize):
+                    if error:
+                        summary["failed"] += 1
+                        log.warning(f"⚠️ Publication {pub_id} kept its old text: {error}")
+                        continue
+                    rows.append({"id": pub_id, "text_extratect": text})
+
+                summary["updated"] += self.handle.call("update_text_extracted", rows=rows)
+                log.info(f"✅ Batch done, {summary['updated']} updated so far")
+
+        log.info(f"🏁 Re-extraction finished in {time.perf_counter() - start:.1f}s: {summary}")
+        return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-run the extractor over the stored raw_html")
+    parser.add_argument("--workers", type=int, default=None, help="processes, defaults to the CPU count")
+    parser.add_argument("--extractor", choices=["lxml", "soup"], default="lxml", help="HTML extraction backend")
+    parser.add_argument("--batch", type=int, default=None, help="rows fetched and updated at a time")
+    args = parser.parse_args()
+
+    summary = ReExtraction(workers=args.workers, backend=args.extractor, batch_size=args.batch).run()
+    print(f"FINALLY: {summary}")
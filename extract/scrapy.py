@@ -6,18 +6,20 @@
 import os
 import sys
 import time
-import random
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 
-from typing import Dict, Union
+from typing import Dict, Iterator, Tuple, Union
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-import re
 import requests
 import pandas as pd
-from bs4 import BeautifulSoup, Tag
+from requests.adapters import HTTPAdapter
 
 from business import handle_db
+from extract.limiter import HostRateLimiter
+from extract.extractors import ExtractorErrors, get_extractor, clean_text
 from logs import config as save
 log = save.setup_logs("scrapy_debug.txt")
 
@@ -30,15 +32,56 @@ class ScrapyErrors(Exception):
 class ScrapyDocs():
     DOCS_FONT = "publications/SB_publication_PMC.csv"
     DOCS_SAVE_DATA = "extract/docs"
+    HEADERS = {
+        "User-Agent": (
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+            "AppleWebKit/537.36 (KHTML, like Gecko) "
+            "Chrome/125.0.0.0 Safari/537.36"
+        ),
+        "Accept-Language": "en-US,en;q=0.9",
+        "Referer": "https://www.google.com/",
+    }
+    EXTRACTOR = "lxml"
+    MAX_WORKERS = 4
+    RATE_PER_HOST = 1.0
+    BURST_PER_HOST = 2
+    TIMEOUT = 30
+    RETRIES = 2
+    RETRY_DELAY = 2.0
+    MAX_ATTEMPTS = 5
+    BACKOFF_SECONDS = 300
     
 
-    def __init__(self):
+    def __init__(self, max_workers: int = None, rate_per_host: float = None, burst_per_host: int = None,
+                 extractor: str = None):
         """Show the directory of the CSV that contains the publications
         the CSV contains the title and the link and where to save the extractions
+
+        Args:
+            max_workers (int): threads used by the concurrent crawl
+            rate_per_host (float): requests per second allowed for each host
+            burst_per_host (int): requests a host may receive back to back before throttling
+            extractor (str): backend that separates the article from the HTML ("lxml" or "soup")
         """
         self.font = self.DOCS_FONT
         self.dir_save = self.DOCS_SAVE_DATA
+        self.max_workers = max_workers or self.MAX_WORKERS
+        self.limiter = HostRateLimiter(
+            rate=rate_per_host or self.RATE_PER_HOST,
+            capacity=burst_per_host or self.BURST_PER_HOST,
+        )
+        self.session = self.build_session()
+        self.extractor = get_extractor(extractor or self.EXTRACTOR)
         self.handle = handle_db.HandlerDatabase() 
+
+    def build_session(self) -> requests.Session:
+        """Session shared by every request, keeping one connection per worker alive"""
+        session = requests.Session()
+        session.headers.update(self.HEADERS)
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
     
     def setup_search(self) -> Dict | ScrapyErrors:
         """Retrieve each search link contained in the CSV"""
@@ -51,6 +94,76 @@ class ScrapyDocs():
             log.error(message)
             raise ScrapyErrors(message) from errors
 
+    def fetch_html(self, url: str, retries: int = 0) -> str:
+        """Download the page respecting the budget of its host
+
+        Args:
+            url (str): publication link
+            retries (int): extra attempts for transient errors (network, 429 and 5xx)
+
+        Returns:
+            raw_html (str): page content
+        """
+        for attempt in range(retries + 1):
+            try:
+                self.limiter.acquire(url)
+                response = self.session.get(url, timeout=self.TIMEOUT)
+                response.raise_for_status()
+                return response.text
+            except requests.RequestException as errors:
+                if attempt == retries or not self.is_transient(errors):
+                    raise
+                delay = self.RETRY_DELAY * 2 ** attempt
+                log.warning(f"⚠️ Attempt {attempt + 1} failed for {url}, retrying in {delay:.0f}s: {errors}")
+                time.sleep(delay)
+
+    @staticmethod
+    def is_transient(errors: requests.RequestException) -> bool:
+        """Client errors other than 429 will not change by trying again"""
+        response = getattr(errors, "response", None)
+        if response is None:
+            return True
+        return response.status_code == 429 or response.status_code >= 500
+
+    def extract_text(self, raw_html: str) -> str:
+        """Keep only the article content, without references, notes and footer
+
+        Args:
+            raw_html (str): page downloaded from the publication link
+
+        Raises:
+            exception (ScrapyErrors): the page has no 'Article content' section
+
+        Returns:
+            text (str): text of the article already cleaned
+        """
+        try:
+            return self.extractor.extract(raw_html)
+        except ExtractorErrors as errors:
+            raise ScrapyErrors(str(errors)) from errors
+
+    def scrape_link(self, title: str, url: str, retries: int = 0) -> Dict:
+        """Download and extract a single publication, without touching the database"""
+        raw_html = self.fetch_html(url, retries=retries)
+        return {
+            "title": title,
+            "url": url,
+            "raw_html": raw_html,
+            "text_extratect": self.extract_text(raw_html),
+        }
+
+    def save_publication(self, page: Dict) -> str:
+        """Persist a page returned by scrape_link"""
+        status = self.handle.call(
+            "insert_publication",
+            title=page["title"],
+            url=page["url"],
+            raw_html=page["raw_html"],
+            text_extratect=page["text_extratect"]
+        )
+        log.info(f"✅ Text {page['title']}.txt for {page['url']} extracted with success!")
+        return status
+
     def get_docs_html(self, search: Dict) -> Union[str, ScrapyErrors]:
         """Responsible for going to each link, 
         capturing the document that is in HTML, 
@@ -68,66 +181,9 @@ class ScrapyDocs():
         try:
             for title, link in search.items():
                 url = link
-                title_doc = title + ".txt"
                 
                 try:
-                    headers = {
-                        "User-Agent": (
-                            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                            "AppleWebKit/537.36 (KHTML, like Gecko) "
-                            "Chrome/125.0.0.0 Safari/537.36"
-                        ),
-                        "Accept-Language": "en-US,en;q=0.9",
-                        "Referer": "https://www.google.com/",
-                    }
-                    response = requests.get(url, headers=headers, timeout=30)
-                    response.raise_for_status()
-
-                    raw_html = response.text
-                    soup = BeautifulSoup(response.text, "lxml")
-                    exclude_patterns = [
-                        "notes", "ack1", "ref", "contrib",
-                        "fn", "Bib", "sec", "__ad", "founding"
-                    ]
-
-                    section = soup.find("section", attrs={"aria-label": "Article content"})
-                    if not section:
-                        raise Exception("Section 'Article content' not found.")
-
-
-                    for tag in list(section.find_all(True)):
-                        try:
-                            if not isinstance(tag, Tag):
-                                continue
-
-                            id_attr = tag.get("id", "") or ""
-                            class_attr = " ".join(tag.get("class", [])) if tag.get("class") else ""
-
-                            if any(
-                                pat.lower() in id_attr.lower() or pat.lower() in class_attr.lower()
-                                for pat in exclude_patterns
-                            ):
-                                tag.decompose()
-                        except Exception as e:
-                            log.warning(f"⚠️ Ignored invalid tag: {e}")
-                            continue
-
-                    footer = section.find("footer")
-                    if footer:
-                        footer.decompose()
-                    
-
-                    text_extracted = self.clean_text(section.get_text(separator="\n", strip=True))
-                    self.handle.call(
-                        "insert_publication",
-                        title=title,
-                        url=url,
-                        raw_html=raw_html,
-                        text_extratect=text_extracted
-                    )
-
-                    log.info(f"✅ Text {title_doc} for {url} extracted with success!")
-                    time.sleep(random.uniform(2, 5))
+                    self.save_publication(self.scrape_link(title, url))
 
                 except Exception as errors:
                     message = f"Error visiting site -> {url} and capturing data: {errors}"
@@ -140,7 +196,146 @@ class ScrapyDocs():
             message = f"Error in the search run: {errors}"
             log.error(message)
             raise ScrapyErrors(message) from errors
+
+    def crawl(self, search: Dict, retries: int = 0) -> Iterator[Dict]:
+        """Scrape every link on a bounded thread pool sharing the pooled session.
+        Pages are yielded as soon as they are ready, failures come back with an "error" key
+
+        Args:
+            search (Dict): dictionary with document title and search link
+            retries (int): extra attempts of each link for transient errors
+
+        Returns:
+            pages (Iterator[Dict]): title, url, raw_html and text_extratect of each link
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scrapy")
+        try:
+            futures = {
+                executor.submit(self.scrape_link, title, link, retries): (title, link)
+                for title, link in search.items()
+            }
+            for future in as_completed(futures):
+                title, link = futures[future]
+                try:
+                    yield future.result()
+                except Exception as errors:
+                    yield {"title": title, "url": link, "error": errors}
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def get_docs_html_concurrent(self, search: Dict) -> Union[str, ScrapyErrors]:
+        """Same contract as get_docs_html, but downloads several links at once.
+        The throughput is bounded by the per-host token bucket, not by a fixed sleep
+
+        Args:
+            search (Dict): dictionary with document title and search link
+
+        Raises:
+            exception (ScrapyErrors): first link that could not be extracted or saved
+
+        Returns:
+            status (str): success if all links were extracted and saved
+        """
+        log.info(f"🚀 Concurrent crawl of {len(search)} links with {self.max_workers} workers")
+        try:
+            for page in self.crawl(search):
+                if "error" in page:
+                    message = f"Error visiting site -> {page['url']} and capturing data: {page['error']}"
+                    log.error(message)
+                    raise ScrapyErrors(message) from page["error"]
+                self.save_publication(page)
+
+            return "success"
+
+        except ScrapyErrors:
+            raise
+        except Exception as errors:
+            message = f"Error in the search run: {errors}"
+            log.error(message)
+            raise ScrapyErrors(message) from errors
     
+    def pending_links(self, search: Dict, stored: set, status: Dict) -> Dict:
+        """Keep only the links that are not stored yet and whose backoff already expired
+
+        Args:
+            search (Dict): dictionary with document title and search link
+            stored (set): URLs already present in nasa.publications
+            status (Dict): crawl state by URL, as returned by get_crawl_status
+
+        Returns:
+            pending (Dict): title and link of what still has to be fetched
+        """
+        now = datetime.now()
+        pending, seen = {}, set()
+        for title, link in search.items():
+            if link in stored or link in seen:
+                continue
+            seen.add(link)
+
+            state = status.get(link)
+            if state and state["status"] == "failed":
+                if state["attempts"] >= self.MAX_ATTEMPTS:
+                    continue
+                if state["next_attempt"] and state["next_attempt"] > now:
+                    continue
+            pending[title] = link
+        return pending
+
+    def next_attempt(self, attempts: int) -> datetime:
+        """Exponential backoff between runs for a link that keeps failing"""
+        return datetime.now() + timedelta(seconds=self.BACKOFF_SECONDS * 2 ** max(0, attempts - 1))
+
+    def get_docs_html_incremental(self, search: Dict) -> Tuple[str, Dict]:
+        """Fetch only the publications that are missing from the database.
+        A failing link does not stop the crawl, it is recorded in nasa.crawl_status
+        and tried again in a later run once its backoff expires
+
+        Args:
+            search (Dict): dictionary with document title and search link
+
+        Raises:
+            exception (ScrapyErrors): the stored state could not be read
+
+        Returns:
+            status (str): success if every pending link was saved, partial otherwise
+            summary (Dict): number of links skipped, saved and failed
+        """
+        try:
+            stored = self.handle.call("get_publication_urls")
+            status = self.handle.call("get_crawl_status")
+        except Exception as errors:
+            message = f"Error loading the crawl state: {errors}"
+            log.error(message)
+            raise ScrapyErrors(message) from errors
+
+        pending = self.pending_links(search, stored, status)
+        summary = {"skipped": len(search) - len(pending), "saved": 0, "failed": 0}
+        log.info(f"🔁 Incremental crawl: {len(pending)} pending, {summary['skipped']} skipped")
+
+        for page in self.crawl(pending, retries=self.RETRIES):
+            try:
+                if "error" in page:
+                    raise page["error"]
+                self.save_publication(page)
+                self.handle.call("save_crawl_status", url=page["url"], title=page["title"], status="done")
+                summary["saved"] += 1
+
+            except Exception as errors:
+                summary["failed"] += 1
+                attempts = status.get(page["url"], {}).get("attempts", 0) + 1
+                log.error(f"Error visiting site -> {page['url']} (attempt {attempts}): {errors}")
+                self.handle.call(
+                    "save_crawl_status",
+                    url=page["url"],
+                    title=page["title"],
+                    status="failed",
+                    message=str(errors),
+                    next_attempt=self.next_attempt(attempts),
+                )
+
+        log.info(f"🏁 Incremental crawl finished: {summary}")
+        return ("success" if not summary["failed"] else "partial"), summary
+
     def clean_text(self, data: str) -> str:
         """Remove spaces and invisible characters
 
@@ -150,6 +345,4 @@ class ScrapyDocs():
         Returns:
             treated (str): text doc clean
         """
-        text = re.sub(r"\s+", " ", data)
-        treated = text.replace("\xa0", " ")
-        return treated.strip()
\ No newline at end of file
+        return clean_text(data)
\ No newline at end of file
@@ -0,0 +1,78 @@
+# -*- coding:utf-8 -*-
+
+# Autor: Yury
+# Data: 18/10/2026
+
+"""Compare the extraction backends over saved HTML pages.
+
+    python extract/test/bench_extractors.py --fixtures extract/test/fixtures --rounds 50
+
+Any *.html dropped in the fixtures directory (e.g. pages saved from PMC)
+is used. The script fails if the backends disagree on any page.
+"""
+
+import os
+import sys
+import glob
+import time
+import logging
+import argparse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from extract.extractors import BACKENDS, ExtractorErrors
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+# the soup backend warns on every tag left behind by decompose, keep it in its own file
+logging.getLogger("scrapy_debug").propagate = False
+
+
+def extract_all(extractor, pages):
+    results = []
+    for page in pages:
+        try:
+            results.append(extractor.extract(page))
+        except ExtractorErrors as errors:
+            results.append(f"ERROR: {errors}")
+    return results
+
+
+def bench(extractor, pages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        extract_all(extractor, pages)
+    elapsed = time.perf_counter() - start
+    return (len(pages) * rounds) / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pages/sec of each extraction backend")
+    parser.add_argument("--fixtures", default="extract/test/fixtures", help="directory with *.html pages")
+    parser.add_argument("--rounds", type=int, default=20, help="passes over all the pages")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.fixtures, "*.html")))
+    if not paths:
+        logging.error(f"❌ No *.html found in {args.fixtures}")
+        sys.exit(1)
+
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8") as fixture:
+            pages.append(fixture.read())
+    logging.info(f"Loaded {len(pages)} pages ({sum(map(len, pages)) / 1024:.0f} KiB)")
+
+    extractors = {name: backend() for name, backend in BACKENDS.items()}
+    outputs = {name: extract_all(extractor, pages) for name, extractor in extractors.items()}
+    reference = outputs["soup"]
+    for name, output in outputs.items():
+        for path, expected, got in zip(paths, reference, output):
+            if expected != got:
+                logging.error(f"❌ {name} differs from soup on {path}")
+                sys.exit(1)
+
+    speed = {name: bench(extractor, pages, args.rounds) for name, extractor in extractors.items()}
+    for name, pages_sec in speed.items():
+        logging.info(f"{name:>5}: {pages_sec:8.1f} pages/sec ({pages_sec / speed['soup']:.1f}x soup)")
@@ -0,0 +1,85 @@
+# -*- coding:utf-8 -*-
+
+# Autor: Yury
+# Data: 18/10/2026
+
+"""Local stand-in for PMC, used to exercise the crawler without touching the real site.
+
+    python extract/test/stand_in_server.py --links 50 --csv /tmp/stand_in.csv
+    python extract/mech.py --concurrent --font /tmp/stand_in.csv --rate 20 --burst 5
+"""
+
+import time
+import logging
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+FIXTURE = "extract/test/fixtures/pmc_article.html"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    page = b""
+    latency = 0.0
+    fail_every = 0
+    hits = Counter()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            self.hits[int(time.time())] += 1
+            total = sum(self.hits.values())
+
+        time.sleep(self.latency)
+        if self.fail_every and total % self.fail_every == 0:
+            self.send_error(500, "stand-in failure")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(self.page)))
+        self.end_headers()
+        self.wfile.write(self.page)
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+
+def report(server: ThreadingHTTPServer):
+    """Print how many requests arrived in each second, to check the rate limiter"""
+    while True:
+        time.sleep(5)
+        with StandInHandler.lock:
+            seen = sorted(StandInHandler.hits.items())[-5:]
+        logging.info("requests/second: " + ", ".join(str(count) for _, count in seen))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a saved PMC article for every path")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--links", type=int, default=50, help="links written to the CSV")
+    parser.add_argument("--csv", default="/tmp/stand_in.csv", help="CSV that points at this server")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before each answer")
+    parser.add_argument("--fail-every", type=int, default=0, help="answer 500 on every N-th request")
+    args = parser.parse_args()
+
+    with open(FIXTURE, "rb") as fixture:
+        StandInHandler.page = fixture.read()
+    StandInHandler.latency = args.latency
+    StandInHandler.fail_every = args.fail_every
+
+    with open(args.csv, "w", encoding="utf-8") as csv:
+        csv.write("Title,Link\n")
+        for i in range(args.links):
+            csv.write(f"Stand-in publication {i},http://127.0.0.1:{args.port}/pmc/articles/PMC{i}/\n")
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), StandInHandler)
+    threading.Thread(target=report, args=(server,), daemon=True).start()
+    logging.info(f"✅ Serving {FIXTURE} on port {args.port}, CSV at {args.csv}")
+    server.serve_forever()
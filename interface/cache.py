@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import gzip
+import hashlib
+import threading
+from functools import wraps
+from collections import OrderedDict
+from datetime import timezone
+
+import zstandard
+from flask import Response, current_app, request
+
+from logs import config as save
+from business.handle_db import HandlerDatabase
+
+log = save.setup_logs('flask_debug.txt')
+
+
+class ResponseCache():
+    """In-process cache of JSON responses, validated against the corpus version.
+
+    Entries are keyed by route and query args and are only reused while
+    nasa.corpus_version is unchanged, so any write through Database
+    invalidates them. Responses carry an ETag and Last-Modified derived
+    from that version, letting browsers and proxies revalidate with a 304,
+    and large bodies are kept pre-compressed (zstd and gzip).
+    """
+
+    def __init__(self, handler: HandlerDatabase, max_entries: int = 64, min_compress: int = 1024):
+        self.handler = handler
+        self.max_entries = max_entries
+        self.min_compress = min_compress
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def cached(self, view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                version, modified = self.handler.call('get_corpus_version')
+            except Exception as e:
+                log.warning(f"⚠️ Cache bypassed, corpus version unavailable: {e}")
+                return view(*args, **kwargs)
+
+            key = self.key()
+            encoding = self.preferred()
+            # one strong ETag per representation, the compressed bodies differ from the identity one
+            etag = f"{version}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}" + (f"-{encoding}" if encoding else "")
+            modified = self.utc(modified)
+
+            if self.not_modified(etag, modified):
+                return self.build(Response(status=304), etag, modified)
+
+            entry = self.get(key, version)
+            if entry is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                entry = self.store(key, version, response)
+
+            encoding, body = self.negotiate(entry, encoding)
+            response = Response(body, mimetype=entry['mimetype'], headers=entry['headers'])
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            return self.build(response, etag, modified)
+        return wrapper
+
+    @staticmethod
+    def key() -> str:
+        args = sorted(request.args.items(multi=True))
+        return request.path + '?' + '&'.join(f"{name}={value}" for name, value in args)
+
+    @staticmethod
+    def utc(modified):
+        """Last-Modified in UTC; nasa.corpus_version stores a timestamptz, a
+        naive value (before migration 10) is in the server's local time"""
+        if modified is None:
+            return None
+        if modified.tzinfo is None:
+            modified = modified.astimezone()
+        return modified.astimezone(timezone.utc).replace(microsecond=0)
+
+    @staticmethod
+    def not_modified(etag: str, modified) -> bool:
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(etag)
+        since = request.if_modified_since
+        return bool(modified and since and modified <= since)
+
+    @staticmethod
+    def build(response: Response, etag: str, modified) -> Response:
+        response.set_etag(etag)
+        if modified:
+            response.last_modified = modified
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def get(self, key: str, version: int):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry['version'] != version:
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def store(self, key: str, version: int, response: Response) -> dict:
+        body = response.get_data()
+        headers = [
+            (name, value) for name, value in response.headers
+            if name.lower() not in ('content-type', 'content-length', 'content-encoding')
+        ]
+        entry = {'version': version, 'mimetype': response.mimetype, 'headers': headers, 'identity': body}
+        if len(body) >= self.min_compress:
+            entry['zstd'] = zstandard.ZstdCompressor(level=6).compress(body)
+            entry['gzip'] = gzip.compress(body, compresslevel=6)
+
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def preferred():
+        """Encoding the client gets when the body is large enough to be compressed"""
+        accepted = request.accept_encodings
+        for encoding in ('zstd', 'gzip'):
+            if accepted[encoding]:
+                return encoding
+        return None
+
+    @staticmethod
+    def negotiate(entry: dict, encoding: str):
+        if encoding in entry:
+            return encoding, entry[encoding]
+        return None, entry['identity']
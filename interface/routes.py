@@ -8,50 +8,67 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import json
+import time
 from datetime import datetime
+from urllib.parse import urlencode
 
-from flask import Flask, render_template, jsonify, request
+import orjson
+from flask import Flask, Response, render_template, jsonify, request, stream_with_context
 
 from logs import config as save
+from interface.cache import ResponseCache
 from business.handle_db import HandlerDatabase
 
 log = save.setup_logs('flask_debug.txt')
+DOCUMENT_FIELDS = ('id', 'title', 'url', 'date', 'themes')
+LISTING = ('id', 'title', 'url', 'dat_insercao')
+STREAM_PAGE = 200
+MAX_STREAM = 1_000_000
+SEARCH_KINDS = ('chunk', 'theme')
+MAX_THEMES = 1000
+
+
+def orjson_response(data, status=200):
+    return Response(orjson.dumps(data), status=status, mimetype='application/json')
+
+
+def serialize_document(doc, themes, fields):
+    """API shape of a document restricted to `fields`"""
+    document = {}
+    if 'id' in fields:
+        document['id'] = doc.id
+    if 'title' in fields:
+        document['title'] = doc.title
+    if 'url' in fields:
+        document['url'] = doc.url
+    if 'date' in fields:
+        document['date'] = doc.dat_insercao.strftime('%Y-%m-%d') if doc.dat_insercao else None
+    if 'themes' in fields:
+        document['themes'] = themes or {}
+    return document
+
+
+def init_app(app, handler: HandlerDatabase, search=None):
+    """
+    Args:
+        search (SemanticSearch): backs /api/search, which answers 503 without it
+    """
+    cache = ResponseCache(handler)
 
-def init_app(app, handler: HandlerDatabase):
     @app.route('/')
     def index():
         try:
-            documents = handler.call('get_documents', limit=100)
+            entries = handler.call('get_documents_with_themes', limit=100)
             processed_documents = []
 
-            for doc in documents:
-                pipelines = handler.call('get_pipelines_by_publication', publication_id=doc.id)
-                all_memories = []
-                for pipe in pipelines:
-                    all_memories.extend(handler.call('get_all_llm_memories', pipeline_id=pipe.id, model_name='qwen'))
-
-                merged_themes = {}
-                for mem in all_memories:
-                    themes = mem.get('themes', {})
-                    for theme, details in themes.items():
-                        if theme not in merged_themes:
-                            merged_themes[theme] = {
-                                'points': [],
-                                'cause_effects': [],
-                                'observations': [],
-                                'cascade_effects': [],
-                                'impactful': []
-                            }
-                        for key in merged_themes[theme]:
-                            merged_themes[theme][key].extend(details.get(key, []))
-                            merged_themes[theme][key] = list(set(merged_themes[theme][key]))
-
+            for entry in entries:
+                doc = entry['document']
                 processed_documents.append({
                     'id': doc.id,
                     'title': doc.title,
                     'url': doc.url,
                     'date': doc.dat_insercao.strftime('%Y-%m-%d'),
-                    'themes': merged_themes
+                    'themes': entry['themes']
                 })
 
             log.info(f"Fetched {len(processed_documents)} documents for index")
@@ -63,85 +80,92 @@ def init_app(app, handler: HandlerDatabase):
 
 
     @app.route('/api/documents', methods=['GET'])
+    @cache.cached
     def api_documents():
-        try:
-            documents = handler.call('get_documents', limit=1000)
-            processed_documents = []
-
-            for doc in documents:
-                pipelines = handler.call('get_pipelines_by_publication', publication_id=doc.id)
-                all_memories = []
-                for pipe in pipelines:
-                    all_memories.extend(handler.call('get_all_llm_memories', pipeline_id=pipe.id, model_name='qwen'))
-
-                merged_themes = {}
-                for mem in all_memories:
-                    themes = mem.get('themes', {})
-                    for theme, details in themes.items():
-                        if theme not in merged_themes:
-                            merged_themes[theme] = {
-                                'points': [],
-                                'cause_effects': [],
-                                'observations': [],
-                                'cascade_effects': [],
-                                'impactful': []
-                            }
-                        for key in merged_themes[theme]:
-                            merged_themes[theme][key].extend(details.get(key, []))
-                            merged_themes[theme][key] = list(set(merged_themes[theme][key]))
+        streaming = request.args.get('format') == 'ndjson'
+        cap = MAX_STREAM if streaming else 1000
+        limit = request.args.get('limit', str(cap)).strip()
+        cursor = request.args.get('cursor', '').strip()
+        if not limit.isdecimal():
+            return jsonify({'error': 'limit must be a non-negative integer'}), 400
+        if cursor and not cursor.isdecimal():
+            return jsonify({'error': 'cursor must be a document id'}), 400
 
-                processed_documents.append({
-                    'id': doc.id,
-                    'title': doc.title,
-                    'url': doc.url,
-                    'date': doc.dat_insercao.strftime('%Y-%m-%d'),
-                    'themes': merged_themes
-                })
-
-            log.info(f"Fetched {len(processed_documents)} documents for API")
-            return jsonify(processed_documents)
+        try:
+            limit = min(max(int(limit), 1), cap)
+            cursor = int(cursor) if cursor else None
+            fields = request.args.get('fields')
+            fields = [f for f in fields.split(',') if f in DOCUMENT_FIELDS] if fields else list(DOCUMENT_FIELDS)
+            if not fields:
+                return jsonify({'error': f'fields must be among {",".join(DOCUMENT_FIELDS)}'}), 400
+
+            if streaming:
+                return Response(
+                    stream_with_context(stream_documents(fields, limit, cursor)),
+                    mimetype='application/x-ndjson'
+                )
+
+            page, last_id = fetch_documents(fields, limit, cursor)
+            response = orjson_response(page)
+            if len(page) == limit:
+                response.headers['X-Next-Cursor'] = str(last_id)
+                response.headers['Link'] = f'<{request.path}?{next_query(last_id)}>; rel="next"'
+
+            log.info(f"Fetched {len(page)} documents for API")
+            return response
 
         except Exception as e:
             log.error(f"Error fetching documents API: {e}")
             return jsonify({'error': 'Failed to load documents'}), 500
 
+    def fetch_documents(fields, limit, cursor):
+        """One keyset page of documents with only the requested fields, and the id to continue from"""
+        if 'themes' in fields:
+            entries = handler.call('get_documents_with_themes', limit=limit, after_id=cursor)
+        else:
+            entries = [
+                {'document': doc, 'themes': None}
+                for doc in handler.call('get_documents', limit=limit, after_id=cursor, columns=LISTING)
+            ]
+        last_id = entries[-1]['document'].id if entries else cursor
+        return [serialize_document(entry['document'], entry['themes'], fields) for entry in entries], last_id
+
+    def stream_documents(fields, limit, cursor):
+        """NDJSON body: one document per line, read from the database page by page"""
+        sent = 0
+        while sent < limit:
+            page, cursor = fetch_documents(fields, min(STREAM_PAGE, limit - sent), cursor)
+            for document in page:
+                yield orjson.dumps(document) + b'\n'
+            sent += len(page)
+            if len(page) < STREAM_PAGE:
+                break
+
+    def next_query(next_cursor):
+        args = request.args.to_dict()
+        args['cursor'] = str(next_cursor)
+        return urlencode(args)
+
 
     @app.route('/document/<int:doc_id>')
     def document(doc_id):
         try:
-            documents = handler.call('get_documents', limit=1, id=doc_id)
-            if not documents:
+            entries = handler.call(
+                'get_documents_with_themes',
+                id=doc_id,
+                columns=('id', 'title', 'url', 'text_extratect')
+            )
+            if not entries:
                 log.warning(f"Document {doc_id} not found")
                 return jsonify({'error': 'Document not found'}), 404
 
-            doc = documents[0]
-            pipelines = handler.call('get_pipelines_by_publication', publication_id=doc.id)
-            all_memories = []
-            for pipe in pipelines:
-                all_memories.extend(handler.call('get_all_llm_memories', pipeline_id=pipe.id, model_name='qwen'))
-
-            merged_themes = {}
-            for mem in all_memories:
-                themes = mem.get('themes', {})
-                for theme, details in themes.items():
-                    if theme not in merged_themes:
-                        merged_themes[theme] = {
-                            'points': [],
-                            'cause_effects': [],
-                            'observations': [],
-                            'cascade_effects': [],
-                            'impactful': []
-                        }
-                    for key in merged_themes[theme]:
-                        merged_themes[theme][key].extend(details.get(key, []))
-                        merged_themes[theme][key] = list(set(merged_themes[theme][key]))
-
+            doc = entries[0]['document']
             document = {
                 'id': doc.id,
                 'title': doc.title,
                 'url': doc.url,
                 'text': doc.text_extratect[:1000] + '...' if len(doc.text_extratect) > 1000 else doc.text_extratect,
-                'themes': merged_themes
+                'themes': entries[0]['themes']
             }
 
             log.info(f"Fetched document {doc_id}: {doc.title}")
@@ -153,34 +177,16 @@ def init_app(app, handler: HandlerDatabase):
 
 
     @app.route('/api/themes', methods=['GET'])
+    @cache.cached
     def get_themes():
         try:
             keyword = request.args.get('keyword', '')
-            documents = handler.call('get_documents', limit=1000)
-            themes = []
-
-            for doc in documents:
-                pipelines = handler.call('get_pipelines_by_publication', publication_id=doc.id)
-                all_memories = []
-                for pipe in pipelines:
-                    all_memories.extend(handler.call('get_all_llm_memories', pipeline_id=pipe.id, model_name='qwen'))
-
-                merged_themes = {}
-                for mem in all_memories:
-                    doc_themes = mem.get('themes', {})
-                    for theme, details in doc_themes.items():
-                        if theme not in merged_themes:
-                            merged_themes[theme] = details
-                        else:
-                            for key, val in details.items():
-                                merged_themes[theme].setdefault(key, []).extend(val)
-
-                for theme, details in merged_themes.items():
-                    if keyword.lower() in theme.lower():
-                        themes.append({'theme': theme, 'details': details})
+            limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+            offset = max(request.args.get('offset', 0, type=int), 0)
+            themes = handler.call('search_themes', keyword=keyword, limit=limit, offset=offset)
 
             log.info(f"Fetched {len(themes)} themes for keyword: {keyword}")
-            return jsonify(themes)
+            return orjson_response(themes)
 
         except Exception as e:
             log.error(f"Error in themes API: {e}")
@@ -188,25 +194,49 @@ def init_app(app, handler: HandlerDatabase):
 
 
     @app.route('/api/themes/all', methods=['GET'])
+    @cache.cached
     def api_all_themes():
-        try:
-            documents = handler.call('get_documents', limit=1000)
-            themeCounts = {}
-
-            for doc in documents:
-                pipelines = handler.call('get_pipelines_by_publication', publication_id=doc.id)
-                all_memories = []
-                for pipe in pipelines:
-                    all_memories.extend(handler.call('get_all_llm_memories', pipeline_id=pipe.id, model_name='qwen'))
+        top = request.args.get('top', str(MAX_THEMES)).strip()
+        min_count = request.args.get('min_count', '0').strip()
+        if not top.isdecimal() or not 1 <= int(top) <= MAX_THEMES:
+            return jsonify({'error': f'top must be an integer between 1 and {MAX_THEMES}'}), 400
+        if not min_count.isdecimal():
+            return jsonify({'error': 'min_count must be a non-negative integer'}), 400
 
-                for mem in all_memories:
-                    if 'themes' in mem:
-                        for theme in mem['themes']:
-                            themeCounts[theme] = themeCounts.get(theme, 0) + 1
+        try:
+            themeCounts = handler.call('get_theme_counts', top=int(top), min_count=int(min_count))
 
             log.info(f"Fetched {len(themeCounts)} total themes")
-            return jsonify(themeCounts)
+            return orjson_response(themeCounts)
 
         except Exception as e:
             log.error(f"Error fetching all themes: {e}")
-            return jsonify({'error': 'Failed to fetch themes'}), 500
\ No newline at end of file
+            return jsonify({'error': 'Failed to fetch themes'}), 500
+
+
+    @app.route('/api/search', methods=['GET'])
+    @cache.cached
+    def api_search():
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'q is required'}), 400
+        kind = request.args.get('kind')
+        if kind and kind not in SEARCH_KINDS:
+            return jsonify({'error': f'kind must be one of {",".join(SEARCH_KINDS)}'}), 400
+        if search is None:
+            return jsonify({'error': 'Semantic search is not enabled'}), 503
+
+        try:
+            k = min(max(request.args.get('k', 10, type=int), 1), 100)
+            start = time.perf_counter()
+            hits = search.search(query, k=k, kind=kind)
+            for hit in hits:
+                hit['content'] = hit['content'][:500] if hit['content'] else hit['content']
+
+            elapsed = (time.perf_counter() - start) * 1000
+            log.info(f"Semantic search '{query}' returned {len(hits)} hits in {elapsed:.1f} ms")
+            return orjson_response(hits)
+
+        except Exception as e:
+            log.error(f"Error in semantic search for '{query}': {e}")
+            return jsonify({'error': 'Failed to search'}), 500
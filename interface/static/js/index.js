@@ -3,22 +3,45 @@ let filteredDocuments = [];
 let currentPage = 1;
 const docsPerPage = 6;
 
+const topThemes = 100;
+const firstPageSize = docsPerPage * 4;
+const nextPageSize = 500;
+
 document.addEventListener('DOMContentLoaded', async () => {
-    const response = await fetch('/api/documents');
-    allDocuments = await response.json();
-    filteredDocuments = allDocuments;
-    displayPage(1);
-    buildBarChart();
-    buildWordCloud();
+    const themesRequest = fetch(`/api/themes/all?top=${topThemes}`).then(response => response.json());
+    await loadDocuments();
+
+    const themesData = await themesRequest;
+    buildBarChart(themesData);
+    buildWordCloud(themesData);
 });
 
-function filterDocuments() {
+// The first small page is rendered right away; the rest of the corpus
+// keeps arriving in larger cursor pages while the user already browses.
+async function loadDocuments() {
+    let cursor = null;
+    let pageSize = firstPageSize;
+    do {
+        const params = new URLSearchParams({limit: pageSize});
+        if (cursor) params.set('cursor', cursor);
+        const response = await fetch(`/api/documents?${params}`);
+        const page = await response.json();
+
+        allDocuments = allDocuments.concat(page);
+        filterDocuments(cursor ? currentPage : 1);
+
+        cursor = response.headers.get('X-Next-Cursor');
+        pageSize = nextPageSize;
+    } while (cursor);
+}
+
+function filterDocuments(page = 1) {
     const keyword = document.getElementById('keywordFilter').value.toLowerCase();
     filteredDocuments = allDocuments.filter(doc => 
         doc.title.toLowerCase().includes(keyword) ||
         Object.keys(doc.themes).some(t => t.toLowerCase().includes(keyword))
     );
-    displayPage(1);
+    displayPage(page);
 }
 
 function displayPage(page) {
@@ -136,9 +159,7 @@ function buildPagination() {
     pagination.appendChild(lastLi);
 }
 
-async function buildWordCloud() {
-    const response = await fetch('/api/themes/all');
-    const themesData = await response.json();
+function buildWordCloud(themesData) {
     const words = Object.keys(themesData).map(theme => ({text: theme, size: 10 + themesData[theme] * 3}));
 
     const layout = d3.layout.cloud()
@@ -169,9 +190,7 @@ async function buildWordCloud() {
     }
 }
 
-async function buildBarChart() {
-    const response = await fetch('/api/themes/all');
-    const themesData = await response.json();
+function buildBarChart(themesData) {
     const data = Object.entries(themesData).map(([theme, count]) => ({theme, count}));
 
     const container = d3.select("#barChart");
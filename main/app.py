@@ -15,10 +15,27 @@ from interface import routes
 from business.handle_db import HandlerDatabase
 
 app = Flask(__name__, template_folder="../interface/templates", static_folder="../interface/static")
-handler = HandlerDatabase()
+# DB_ASYNC_READS=1 (main/serve.py --async-db) serves the reads through AsyncDatabase
+handler = HandlerDatabase(scoped=True, async_reads=os.getenv("DB_ASYNC_READS", "").lower() in ("1", "true", "yes"))
 log = save.setup_logs('flask_debug.txt')
 
-routes.init_app(app, handler)
+
+# SEMANTIC_SEARCH=1 (main/serve.py --semantic-search) enables /api/search; torch,
+# transformers and faiss are only imported then, and the encoder is loaded here,
+# when the worker starts, instead of during its first request
+search = None
+if os.getenv("SEMANTIC_SEARCH", "").lower() in ("1", "true", "yes"):
+    from business.embeddings import SemanticSearch
+    search = SemanticSearch(handler)
+    search.ready()
+
+routes.init_app(app, handler, search=search)
+
+
+@app.teardown_appcontext
+def release_connection(exception=None):
+    handler.call("release")
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=8617)
\ No newline at end of file
+    # development server only, production runs through main/serve.py
+    app.run(debug=os.getenv("FLASK_DEBUG", "").lower() in ("1", "true", "yes"), host='0.0.0.0', port=8617)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+# Autor: Yury
+# Data: 18/10/2026
+
+"""Build or update the embedding index of the publications.
+
+    python main/embed.py --threads 8
+    python main/embed.py --ids 12 40 41
+
+Only the chunks of publications whose text changed and the themes of
+publications re-analysed since the last run are embedded again.
+"""
+
+import os
+import sys
+import argparse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from business.chunker import Chunker
+from business.handle_db import HandlerDatabase
+from business.embeddings import Embedder, EmbeddingIndexer
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Embed the publication chunks and merged themes into the FAISS index")
+    parser.add_argument("--ids", type=int, nargs="+", default=None, help="only these publications")
+    parser.add_argument("--model", default=None, help="Hugging Face encoder, defaults to EMBEDDING_MODEL or all-MiniLM-L6-v2")
+    parser.add_argument("--batch-size", type=int, default=32, help="texts per forward pass")
+    parser.add_argument("--publications", type=int, default=16, help="publications embedded per transaction")
+    parser.add_argument("--threads", type=int, default=None, help="torch threads, all cores by default")
+    parser.add_argument("--chunk-tokens", type=int, default=200, help="tokens of a chunk, counted by the encoder's tokenizer, which keeps 256")
+    parser.add_argument("--overlap", type=int, default=20, help="tokens repeated between consecutive chunks")
+    parser.add_argument("--dir", default=None, help="index directory, defaults to EMBEDDINGS_DIR or .embeddings")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    embedder = Embedder(args.model, batch_size=args.batch_size, threads=args.threads)
+    indexer = EmbeddingIndexer(
+        HandlerDatabase(),
+        embedder,
+        chunker=Chunker(max_tokens=args.chunk_tokens, overlap=args.overlap, mode="sentences", encoder=embedder.encoder),
+        directory=args.dir,
+        batch_size=args.publications,
+    )
+    print(f"FINALLY: {indexer.sync(publication_ids=args.ids)}")
@@ -5,9 +5,94 @@
 
 import os
 import sys
+import argparse
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from business.llm import LlmCache, LlmClient
+from business import structured
+from business.chunker import Chunker
 from business.orch import BioInsightPipeline
+from business.scheduler import PipelineScheduler
 
-llms = BioInsightPipeline()
-llms.run()
\ No newline at end of file
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the qwen and llama interpretation of the publications")
+    parser.add_argument("--limit", type=int, default=None, help="documents to process, 5 by default or every pending one with --queue")
+    parser.add_argument("--queue", action="store_true", help="only publications not yet analysed or whose text changed, safe to run on several machines")
+    parser.add_argument("--workers", type=int, default=1, help="documents processed at the same time")
+    parser.add_argument("--qwen-parallel", type=int, default=1, help="simultaneous qwen calls")
+    parser.add_argument("--llama-parallel", type=int, default=1, help="simultaneous llama calls")
+    parser.add_argument("--qwen-mode", choices=BioInsightPipeline.QWEN_MODES, default="sequential",
+                        help="sequential carries the themes chunk to chunk, map_reduce analyses chunks in parallel")
+    parser.add_argument("--consolidate", action="store_true", help="map_reduce: merge the chunk themes with one more qwen call")
+    parser.add_argument("--chunk-workers", type=int, default=4, help="map_reduce: chunks of a document sent at once")
+    parser.add_argument("--chunking", choices=Chunker.MODES, default="tokens",
+                        help="tokens cuts fixed windows, sentences keeps sentences and sections whole")
+    parser.add_argument("--chunk-tokens", type=int, default=700, help="tokens allowed in a chunk")
+    parser.add_argument("--overlap", type=int, default=0, help="tokens repeated between consecutive chunks")
+    parser.add_argument("--stream", action="store_true", help="stream answers and stop as soon as the JSON object is closed")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds an LLM call may take")
+    parser.add_argument("--num-ctx", type=int, default=None, help="context window of both models")
+    parser.add_argument("--qwen-num-predict", type=int, default=None, help="maximum tokens generated by qwen per call")
+    parser.add_argument("--llama-num-predict", type=int, default=None, help="maximum tokens generated by llama per call")
+    parser.add_argument("--keep-alive", default=None, help="how long Ollama keeps the models loaded, e.g. 30m")
+    parser.add_argument("--memory-batch", type=int, default=8, help="qwen chunk memories written per transaction")
+    parser.add_argument("--no-cache", action="store_true", help="always ask Ollama, ignoring cached answers")
+    parser.add_argument("--cache-dir", default=None, help="LLM answer cache, defaults to LLM_CACHE_DIR or .llm_cache")
+    parser.add_argument("--ollama-host", default=None, help="Ollama address, defaults to OLLAMA_HOST")
+    parser.add_argument("--embed", action="store_true", help="afterwards, embed the publications analysed by this run for /api/search")
+    return parser.parse_args()
+
+
+def model_options(num_ctx, num_predict):
+    """Ollama options set on the command line, the model defaults otherwise"""
+    options = {"num_ctx": num_ctx, "num_predict": num_predict}
+    return {name: value for name, value in options.items() if value is not None}
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    llm = LlmClient(
+        host=args.ollama_host,
+        limits={
+            BioInsightPipeline.QWEN_MODEL: args.qwen_parallel,
+            BioInsightPipeline.LLAMA_MODEL: args.llama_parallel,
+        },
+        cache=None if args.no_cache else LlmCache(directory=args.cache_dir),
+        options={
+            BioInsightPipeline.QWEN_MODEL: model_options(args.num_ctx, args.qwen_num_predict),
+            BioInsightPipeline.LLAMA_MODEL: model_options(args.num_ctx, args.llama_num_predict),
+        },
+        keep_alive=args.keep_alive,
+        timeout=args.timeout,
+    )
+    llms = BioInsightPipeline(
+        llm=llm,
+        qwen_mode=args.qwen_mode,
+        consolidate=args.consolidate,
+        chunk_workers=args.chunk_workers,
+        chunker=Chunker(max_tokens=args.chunk_tokens, overlap=args.overlap, mode=args.chunking),
+        stream=args.stream,
+        memory_batch=args.memory_batch,
+    )
+    if args.queue and args.workers > 1:
+        summary = PipelineScheduler(llms, workers=args.workers).run_queue(limit=args.limit)
+        processed = summary["processed"]
+        print(f"FINALLY: {summary}")
+    elif args.queue:
+        processed = llms.run_queue(limit=args.limit)
+        print(f"FINALLY: {len(processed)} documents")
+    elif args.workers > 1:
+        summary = PipelineScheduler(llms, workers=args.workers).run(limit=args.limit or 5)
+        processed = summary["processed"]
+        print(f"FINALLY: {summary}")
+    else:
+        processed = llms.run(limit=args.limit or 5)
+    print(f"PARSING: {structured.METRICS.snapshot()}")
+    print(f"LLM CALLS: {llm.stats.summary()}")
+    if llm.cache is not None:
+        print(f"LLM CACHE: {llm.cache.stats()}")
+    if args.embed:
+        # torch, transformers and faiss are only loaded when asked for
+        from business.embeddings import Embedder, EmbeddingIndexer
+        print(f"EMBEDDINGS: {EmbeddingIndexer(llms.handle, Embedder()).sync(publication_ids=processed)}")
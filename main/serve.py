@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+# Autor: Yury
+# Data: 18/10/2026
+
+"""Production server of the web interface: gunicorn, several worker
+processes with a pool of threads each.
+
+    python main/serve.py --workers 4 --threads 8 --async-db
+
+Every worker builds its own database pools after the fork, so the
+connections held at once are up to workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+"""
+
+import os
+import sys
+import argparse
+import multiprocessing
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from gunicorn.app.base import BaseApplication
+
+
+class BioServer(BaseApplication):
+    """main/app.py under gunicorn, configured from the command line"""
+
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for name, value in self.options.items():
+            self.cfg.set(name, value)
+
+    def load(self):
+        # imported in each worker, after the fork
+        from main.app import app
+        return app
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve the web interface with gunicorn")
+    parser.add_argument("--bind", default="0.0.0.0:8617", help="host:port to listen on")
+    parser.add_argument("--workers", type=int, default=min(multiprocessing.cpu_count() * 2 + 1, 8), help="worker processes")
+    parser.add_argument("--threads", type=int, default=8, help="requests served at the same time by each worker")
+    parser.add_argument("--timeout", type=int, default=120, help="seconds before a silent worker is restarted")
+    parser.add_argument("--async-db", action="store_true", help="serve the reads through AsyncDatabase (asyncpg)")
+    parser.add_argument("--semantic-search", action="store_true", help="enable /api/search, each worker loads the encoder at start")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.async_db:
+        os.environ["DB_ASYNC_READS"] = "1"
+    if args.semantic_search:
+        os.environ["SEMANTIC_SEARCH"] = "1"
+
+    BioServer({
+        "bind": args.bind,
+        "workers": args.workers,
+        "worker_class": "gthread",
+        "threads": args.threads,
+        "timeout": args.timeout,
+        "accesslog": "-",
+    }).run()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+from sqlalchemy import text
+
+from models_bio.models_db import compress_text
+
+
+VERSION = 1
+DESCRIPTION = "store nasa.publications.raw_html zstd-compressed as bytea"
+BATCH_SIZE = 200
+
+
+def upgrade(connection, log):
+    """Compress the existing pages into a new bytea column, then swap the columns"""
+    column_type = connection.execute(text("""
+        select data_type from information_schema.columns
+        where table_schema = 'nasa' and table_name = 'publications' and column_name = 'raw_html'
+    """)).scalar()
+    if column_type == "bytea":
+        log.info("raw_html is already bytea, nothing to convert")
+        return
+
+    connection.execute(text("alter table nasa.publications add column if not exists raw_html_zst bytea"))
+
+    last_id, converted = 0, 0
+    while True:
+        rows = connection.execute(text("""
+            select id, raw_html from nasa.publications
+            where id > :last_id and raw_html is not null
+            order by id limit :limit
+        """), {"last_id": last_id, "limit": BATCH_SIZE}).all()
+        if not rows:
+            break
+
+        connection.execute(
+            text("update nasa.publications set raw_html_zst = :data where id = :id"),
+            [{"id": row.id, "data": compress_text(row.raw_html)} for row in rows],
+        )
+        last_id = rows[-1].id
+        converted += len(rows)
+        log.info(f"Compressed {converted} pages")
+
+    connection.execute(text("alter table nasa.publications drop column raw_html"))
+    connection.execute(text("alter table nasa.publications rename column raw_html_zst to raw_html"))
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+from itertools import groupby
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.dialects.postgresql import JSONB
+
+from models_bio.themes import merge_memories
+
+
+VERSION = 2
+DESCRIPTION = "materialize nasa.merged_themes from the qwen memories"
+
+
+def upgrade(connection, log):
+    """Create the table and fill it for every publication that already has memories"""
+    connection.execute(text("""
+        create table if not exists nasa.merged_themes (
+            publication_id integer primary key,
+            themes jsonb,
+            theme_counts jsonb,
+            chunk_count integer default 0,
+            dat_atualizacao timestamp default current_timestamp,
+            constraint fk_merged_publication foreign key (publication_id) references nasa.publications(id) on delete cascade
+        )
+    """))
+
+    rows = connection.execute(text("""
+        select p.publication_id, m.context_json
+        from nasa.llm_memory m
+        join nasa.llm_pipeline p on p.id = m.pipeline_id
+        where m.model_name = 'qwen' and m.context_json is not null
+        order by p.publication_id, p.id, m.id
+    """).execution_options(yield_per=1000))
+
+    upsert = text("""
+        insert into nasa.merged_themes (publication_id, themes, theme_counts, chunk_count)
+        values (:publication_id, :themes, :theme_counts, :chunk_count)
+        on conflict (publication_id) do update set
+            themes = excluded.themes,
+            theme_counts = excluded.theme_counts,
+            chunk_count = excluded.chunk_count,
+            dat_atualizacao = current_timestamp
+    """).bindparams(bindparam("themes", type_=JSONB), bindparam("theme_counts", type_=JSONB))
+
+    values = []
+    for publication_id, group in groupby(rows, key=lambda row: row.publication_id):
+        themes, counts, chunks = merge_memories(row.context_json for row in group)
+        values.append({
+            "publication_id": publication_id,
+            "themes": themes,
+            "theme_counts": counts,
+            "chunk_count": chunks,
+        })
+
+    if values:
+        connection.execute(upsert, values)
+    log.info(f"Merged themes of {len(values)} publications")
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.dialects.postgresql import JSONB
+
+from models_bio.themes import search_text
+
+
+VERSION = 3
+DESCRIPTION = "trigram search index over theme names and details (nasa.theme_index)"
+
+
+def upgrade(connection, log):
+    """Create the normalized theme table with its GIN indexes and fill it from nasa.merged_themes"""
+    connection.execute(text("create extension if not exists pg_trgm"))
+    connection.execute(text("""
+        create table if not exists nasa.theme_index (
+            id serial primary key,
+            publication_id integer not null,
+            theme text,
+            details jsonb,
+            search_text text,
+            constraint fk_theme_publication foreign key (publication_id) references nasa.publications(id) on delete cascade
+        )
+    """))
+    connection.execute(text("create index if not exists idx_theme_index_publication on nasa.theme_index (publication_id)"))
+    connection.execute(text("create index if not exists idx_theme_index_theme_trgm on nasa.theme_index using gin (theme gin_trgm_ops)"))
+    connection.execute(text("create index if not exists idx_theme_index_search_trgm on nasa.theme_index using gin (search_text gin_trgm_ops)"))
+
+    connection.execute(text("truncate nasa.theme_index"))
+    rows = connection.execute(text("select publication_id, themes from nasa.merged_themes")).all()
+    values = [
+        {"publication_id": row.publication_id, "theme": theme, "details": details, "search_text": search_text(details)}
+        for row in rows
+        for theme, details in (row.themes or {}).items()
+    ]
+    if values:
+        connection.execute(
+            text("""
+                insert into nasa.theme_index (publication_id, theme, details, search_text)
+                values (:publication_id, :theme, :details, :search_text)
+            """).bindparams(bindparam("details", type_=JSONB)),
+            values,
+        )
+    log.info(f"Indexed {len(values)} themes")
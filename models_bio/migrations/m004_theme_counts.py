@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+from sqlalchemy import text
+
+
+VERSION = 4
+DESCRIPTION = "theme frequency aggregate (nasa.theme_counts)"
+
+# count every qwen memory stored, also what Database.rebuild_theme_counts re-runs
+RECOUNT = """
+    insert into nasa.theme_counts (theme, occurrences)
+    select t.theme, count(*)
+    from nasa.llm_memory m,
+         jsonb_object_keys(
+             case when jsonb_typeof(m.context_json -> 'themes') = 'object'
+                  then m.context_json -> 'themes' else '{}'::jsonb end
+         ) as t(theme)
+    where m.model_name = 'qwen'
+    group by t.theme
+    on conflict (theme) do update set
+        occurrences = excluded.occurrences,
+        dat_atualizacao = current_timestamp
+"""
+
+
+def upgrade(connection, log):
+    """Create the aggregate and count every qwen memory already stored"""
+    connection.execute(text("""
+        create table if not exists nasa.theme_counts (
+            theme text primary key,
+            occurrences integer default 0,
+            dat_atualizacao timestamp default current_timestamp
+        )
+    """))
+    connection.execute(text("create index if not exists idx_theme_counts_occurrences on nasa.theme_counts (occurrences desc)"))
+
+    result = connection.execute(text(RECOUNT))
+    log.info(f"Counted {result.rowcount} themes")
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+from sqlalchemy import text
+
+
+VERSION = 5
+DESCRIPTION = "corpus version counter used to invalidate the HTTP cache (nasa.corpus_version)"
+
+
+def upgrade(connection, log):
+    connection.execute(text("""
+        create table if not exists nasa.corpus_version (
+            id integer primary key,
+            version bigint default 0,
+            dat_atualizacao timestamp default current_timestamp
+        )
+    """))
+    connection.execute(text("insert into nasa.corpus_version (id, version) values (1, 0) on conflict (id) do nothing"))
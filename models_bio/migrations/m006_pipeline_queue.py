@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+from sqlalchemy import text
+
+
+VERSION = 6
+DESCRIPTION = "text hash on nasa.llm_pipeline and nasa.pipeline_claims for the LLM work queue"
+
+
+def upgrade(connection, log):
+    connection.execute(text("alter table nasa.llm_pipeline add column if not exists text_hash varchar(32)"))
+    connection.execute(text("""
+        create index if not exists idx_llm_pipeline_publication_stage
+        on nasa.llm_pipeline (publication_id, stage, status)
+    """))
+    connection.execute(text("""
+        create table if not exists nasa.pipeline_claims (
+            publication_id integer primary key,
+            worker varchar(255),
+            lease_until timestamp,
+            dat_insercao timestamp default current_timestamp,
+            constraint fk_claim_publication foreign key (publication_id) references nasa.publications(id) on delete cascade
+        )
+    """))
+
+    # rows written before the hash existed refer to the text stored today
+    updated = connection.execute(text("""
+        update nasa.llm_pipeline l
+        set text_hash = md5(p.text_extratect)
+        from nasa.publications p
+        where p.id = l.publication_id and l.status = 'success' and l.text_hash is null
+    """)).rowcount
+    log.info(f"Hashed the text of {updated} successful pipeline rows")
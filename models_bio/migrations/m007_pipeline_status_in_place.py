@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+from sqlalchemy import text
+
+
+VERSION = 7
+DESCRIPTION = "fold the duplicate 'success' rows of nasa.llm_pipeline into their 'running' row"
+
+
+def upgrade(connection, log):
+    # Each stage used to insert a 'running' row, holding the memories, and a
+    # second 'success' row with the result. The result moves to the running
+    # row, the one the memories point to, and the extra row is removed.
+    merged = connection.execute(text("""
+        with pairs as (
+            select distinct on (running_id) running_id, success_id
+            from (
+                select s.id as success_id, (
+                    select max(r.id) from nasa.llm_pipeline r
+                    where r.publication_id = s.publication_id
+                      and r.stage = s.stage
+                      and r.status = 'running'
+                      and r.id < s.id
+                ) as running_id
+                from nasa.llm_pipeline s
+                where s.status = 'success'
+            ) candidates
+            where running_id is not null
+            order by running_id, success_id
+        ), folded as (
+            update nasa.llm_pipeline r
+            set status = s.status,
+                result_json = s.result_json,
+                message = s.message,
+                text_hash = coalesce(r.text_hash, s.text_hash)
+            from pairs p
+            join nasa.llm_pipeline s on s.id = p.success_id
+            where r.id = p.running_id
+            returning p.success_id
+        )
+        delete from nasa.llm_pipeline
+        where id in (select success_id from folded)
+          and not exists (select 1 from nasa.llm_memory m where m.pipeline_id = nasa.llm_pipeline.id)
+    """)).rowcount
+    log.info(f"Folded {merged} success rows into their running pipeline")
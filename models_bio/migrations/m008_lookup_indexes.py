@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+import json
+
+from sqlalchemy import text
+
+from models_bio.themes import merge_memories, search_text
+
+
+VERSION = 8
+DESCRIPTION = "unique publication url, foreign keys and composite indexes on the pipeline lookups"
+
+FOREIGN_KEYS = {
+    "fk_publication": """
+        alter table nasa.llm_pipeline add constraint fk_publication
+        foreign key (publication_id) references nasa.publications(id) on delete cascade
+    """,
+    "fk_pipeline": """
+        alter table nasa.llm_memory add constraint fk_pipeline
+        foreign key (pipeline_id) references nasa.llm_pipeline(id) on delete cascade
+    """,
+}
+
+INDEXES = [
+    # get_pipelines_by_publication, get_resumable_pipeline
+    "create index if not exists idx_llm_pipeline_publication on nasa.llm_pipeline (publication_id, id)",
+    # get_all_llm_memories, get_chunk_memories, get_last_llm_memory, the memories of get_documents_with_memories
+    "create index if not exists idx_llm_memory_pipeline_model on nasa.llm_memory (pipeline_id, model_name, chunk_index)",
+]
+
+
+def constraint_exists(connection, name: str) -> bool:
+    return connection.execute(
+        text("select 1 from pg_constraint where conname = :name and connamespace = 'nasa'::regnamespace"),
+        {"name": name},
+    ).scalar() is not None
+
+
+def dedupe_urls(connection, log):
+    """Keep the first publication of every url, moving the pipelines of the copies to it"""
+    duplicates = connection.execute(text("""
+        select id, min(id) over (partition by url) as keep
+        from nasa.publications
+        where url is not null
+    """)).all()
+    moves = [{"id": row.id, "keep": row.keep} for row in duplicates if row.id != row.keep]
+    if not moves:
+        return
+
+    connection.execute(text("update nasa.llm_pipeline set publication_id = :keep where publication_id = :id"), moves)
+    connection.execute(text("delete from nasa.publications where id = :id"), moves)
+    log.info(f"Removed {len(moves)} duplicated publications, their pipelines now point to the kept row")
+
+    # the merged themes of the copies went away with them, rebuild the kept ones from all memories
+    for keep in sorted({move["keep"] for move in moves}):
+        memories = connection.execute(text("""
+            select m.context_json from nasa.llm_memory m
+            join nasa.llm_pipeline l on l.id = m.pipeline_id
+            where l.publication_id = :keep and m.model_name = 'qwen'
+            order by l.id, m.id
+        """), {"keep": keep}).scalars().all()
+        themes, counts, chunks = merge_memories(memories)
+        connection.execute(text("""
+            insert into nasa.merged_themes (publication_id, themes, theme_counts, chunk_count)
+            values (:keep, cast(:themes as jsonb), cast(:counts as jsonb), :chunks)
+            on conflict (publication_id) do update set
+                themes = excluded.themes,
+                theme_counts = excluded.theme_counts,
+                chunk_count = excluded.chunk_count,
+                dat_atualizacao = current_timestamp
+        """), {"keep": keep, "themes": json.dumps(themes), "counts": json.dumps(counts), "chunks": chunks})
+        connection.execute(text("delete from nasa.theme_index where publication_id = :keep"), {"keep": keep})
+        if themes:
+            connection.execute(
+                text("""
+                    insert into nasa.theme_index (publication_id, theme, details, search_text)
+                    values (:keep, :theme, cast(:details as jsonb), :search_text)
+                """),
+                [
+                    {"keep": keep, "theme": theme, "details": json.dumps(details), "search_text": search_text(details)}
+                    for theme, details in themes.items()
+                ],
+            )
+
+
+def upgrade(connection, log):
+    # indexes first, the dedupe and the foreign key checks below already use them
+    for statement in INDEXES:
+        connection.execute(text(statement))
+
+    dedupe_urls(connection, log)
+    if not constraint_exists(connection, "uq_publications_url"):
+        connection.execute(text("alter table nasa.publications add constraint uq_publications_url unique (url)"))
+
+    # rows left behind by deletes made while the foreign keys were missing
+    pipelines = connection.execute(text("""
+        delete from nasa.llm_pipeline l
+        where not exists (select 1 from nasa.publications p where p.id = l.publication_id)
+    """)).rowcount
+    memories = connection.execute(text("""
+        delete from nasa.llm_memory m
+        where not exists (select 1 from nasa.llm_pipeline l where l.id = m.pipeline_id)
+    """)).rowcount
+    if pipelines or memories:
+        log.info(f"Removed {pipelines} orphan pipelines and {memories} orphan memories")
+
+    for name, statement in FOREIGN_KEYS.items():
+        if not constraint_exists(connection, name):
+            connection.execute(text(statement))
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+from sqlalchemy import text
+
+
+VERSION = 9
+DESCRIPTION = "nasa.embeddings, metadata of the vectors in the FAISS index"
+
+
+def upgrade(connection, log):
+    connection.execute(text("""
+        create table if not exists nasa.embeddings (
+            id serial primary key,
+            publication_id integer not null,
+            model_name varchar(255) not null,
+            kind varchar(16) not null,
+            chunk_index integer,
+            theme text,
+            content text,
+            source_hash varchar(32),
+            dat_insercao timestamp default current_timestamp,
+            constraint fk_embedding_publication foreign key (publication_id) references nasa.publications(id) on delete cascade
+        )
+    """))
+    connection.execute(text("""
+        create index if not exists idx_embeddings_publication
+        on nasa.embeddings (publication_id, model_name, kind)
+    """))
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+from sqlalchemy import text
+
+
+VERSION = 10
+DESCRIPTION = "nasa.corpus_version.dat_atualizacao as timestamptz, the Last-Modified of the HTTP cache"
+
+
+def upgrade(connection, log):
+    # the naive values were written by current_timestamp in the session time zone
+    connection.execute(text("""
+        alter table nasa.corpus_version
+            alter column dat_atualizacao type timestamptz
+            using dat_atualizacao at time zone current_setting('TimeZone')
+    """))
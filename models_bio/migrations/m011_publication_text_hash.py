@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+from sqlalchemy import text
+
+
+VERSION = 11
+DESCRIPTION = "nasa.publications.text_hash, md5 of text_extratect kept by Postgres for the LLM queue"
+
+
+def upgrade(connection, log):
+    # a stored generated column: filled for every existing row here, then
+    # recomputed on each write of text_extratect, whatever path makes it
+    connection.execute(text("""
+        alter table nasa.publications
+            add column if not exists text_hash varchar(32)
+            generated always as (md5(text_extratect)) stored
+    """))
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+from itertools import groupby
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.dialects.postgresql import JSONB
+
+from models_bio.themes import merge_memories, search_text
+
+
+VERSION = 12
+DESCRIPTION = "nasa.merged_themes built from the current qwen run only (pipeline_id)"
+
+
+def upgrade(connection, log):
+    """Record the run each row comes from and rebuild the rows, and their
+    search rows, from the latest qwen run over the current text. Until
+    now every run was merged, also the ones over a text since replaced"""
+    connection.execute(text("alter table nasa.merged_themes add column if not exists pipeline_id integer"))
+
+    rows = connection.execute(text("""
+        select c.publication_id, c.pipeline_id, m.context_json
+        from (
+            select distinct on (l.publication_id) l.publication_id, l.id as pipeline_id
+            from nasa.llm_pipeline l
+            join nasa.publications p on p.id = l.publication_id and l.text_hash = p.text_hash
+            where l.stage = 'qwen_analysis'
+            order by l.publication_id, l.id desc
+        ) c
+        join nasa.llm_memory m on m.pipeline_id = c.pipeline_id
+        where m.model_name = 'qwen' and m.context_json is not null
+        order by c.publication_id, m.id
+    """).execution_options(yield_per=1000))
+
+    values = []
+    for (publication_id, pipeline_id), group in groupby(rows, key=lambda row: (row.publication_id, row.pipeline_id)):
+        themes, counts, chunks = merge_memories(row.context_json for row in group)
+        values.append({
+            "publication_id": publication_id,
+            "pipeline_id": pipeline_id,
+            "themes": themes,
+            "theme_counts": counts,
+            "chunk_count": chunks,
+        })
+    if not values:
+        log.info("No merged themes to rebuild")
+        return
+
+    connection.execute(text("""
+        insert into nasa.merged_themes (publication_id, pipeline_id, themes, theme_counts, chunk_count)
+        values (:publication_id, :pipeline_id, :themes, :theme_counts, :chunk_count)
+        on conflict (publication_id) do update set
+            pipeline_id = excluded.pipeline_id,
+            themes = excluded.themes,
+            theme_counts = excluded.theme_counts,
+            chunk_count = excluded.chunk_count,
+            dat_atualizacao = current_timestamp
+    """).bindparams(bindparam("themes", type_=JSONB), bindparam("theme_counts", type_=JSONB)), values)
+
+    connection.execute(
+        text("delete from nasa.theme_index where publication_id = any(:ids)"),
+        {"ids": [value["publication_id"] for value in values]},
+    )
+    indexed = [
+        {"publication_id": value["publication_id"], "theme": theme, "details": details, "search_text": search_text(details)}
+        for value in values
+        for theme, details in value["themes"].items()
+    ]
+    if indexed:
+        connection.execute(
+            text("""
+                insert into nasa.theme_index (publication_id, theme, details, search_text)
+                values (:publication_id, :theme, :details, :search_text)
+            """).bindparams(bindparam("details", type_=JSONB)),
+            indexed,
+        )
+    log.info(f"Rebuilt the merged themes of {len(values)} publications, {len(indexed)} themes indexed")
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+"""Apply the pending schema migrations, in version order.
+
+    python models_bio/migrations/migrate.py [--create-schema] [--rebuild-theme-counts]
+
+Each mNNN_*.py module exposes VERSION, DESCRIPTION and upgrade(connection, log).
+Every migration runs in its own transaction and is recorded in nasa.schema_migrations.
+--rebuild-theme-counts recounts nasa.theme_counts, which only grows, from the memories stored.
+"""
+
+import os
+import sys
+import pkgutil
+import importlib
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import text
+
+from orm.database import Database
+from logs import config as save
+log = save.setup_logs('migrations_debug.txt')
+
+
+def load_migrations():
+    """Modules of this directory named mNNN_*, sorted by VERSION"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    modules = [
+        importlib.import_module(f"models_bio.migrations.{info.name}")
+        for info in pkgutil.iter_modules([directory])
+        if info.name.startswith("m") and info.name[1:4].isdigit()
+    ]
+    return sorted(modules, key=lambda module: module.VERSION)
+
+
+def migrate(engine):
+    """Run every migration not yet recorded
+
+    Returns:
+        applied (list): versions applied in this call
+    """
+    with engine.begin() as connection:
+        connection.execute(text("""
+            create table if not exists nasa.schema_migrations (
+                version integer primary key,
+                description text,
+                dat_insercao timestamp default current_timestamp
+            )
+        """))
+        done = set(connection.execute(text("select version from nasa.schema_migrations")).scalars())
+
+    applied = []
+    for module in load_migrations():
+        if module.VERSION in done:
+            continue
+        log.info(f"🚀 Migration {module.VERSION}: {module.DESCRIPTION}")
+        with engine.begin() as connection:
+            module.upgrade(connection, log)
+            connection.execute(
+                text("insert into nasa.schema_migrations (version, description) values (:version, :description)"),
+                {"version": module.VERSION, "description": module.DESCRIPTION},
+            )
+        log.info(f"✅ Migration {module.VERSION} applied")
+        applied.append(module.VERSION)
+    return applied
+
+
+if __name__ == "__main__":
+    database = Database()
+    if "--create-schema" in sys.argv:
+        database.create_schema()
+    applied = migrate(database.engine)
+    print(f"FINALLY: applied {applied or 'nothing'}")
+    if "--rebuild-theme-counts" in sys.argv:
+        print(f"FINALLY: recounted {database.rebuild_theme_counts()} themes")
@@ -4,45 +4,171 @@
 # Data: 04/10/2025
 
 
-from sqlalchemy.orm import declarative_base
+import zstandard
+from sqlalchemy.orm import declarative_base, deferred
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy import create_engine, Column, Integer, String, Text, TIMESTAMP, func
+from sqlalchemy.types import TypeDecorator, LargeBinary
+from sqlalchemy import create_engine, Column, BigInteger, Computed, ForeignKey, Index, Integer, String, Text, TIMESTAMP, UniqueConstraint, func
 
 
 Base = declarative_base()
+ZSTD_LEVEL = 9
+
+
+def compress_text(value: str) -> bytes:
+    """zstd frame of the UTF-8 text (compressor objects are not thread-safe, so one per call)"""
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(value.encode("utf-8"))
+
+
+def decompress_text(value: bytes) -> str:
+    return zstandard.ZstdDecompressor().decompress(bytes(value)).decode("utf-8")
+
+
+class ZstdText(TypeDecorator):
+    """Text stored zstd-compressed in a bytea column, read and written as str"""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value) if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value) if value is not None else None
+
 
 class Publications(Base):
     __tablename__ = "publications"
-    __table_args__ = {"schema": "nasa"}
+    __table_args__ = (
+        UniqueConstraint("url", name="uq_publications_url"),
+        {"schema": "nasa"},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     title = Column(String(255))
     url = Column(Text)
-    raw_html = Column(Text)
+    raw_html = deferred(Column(ZstdText))
     text_extratect = Column(Text)
+    # md5 of text_extratect, what LlmPipeline.text_hash is compared with
+    text_hash = Column(String(32), Computed("md5(text_extratect)", persisted=True))
     dat_insercao = Column(TIMESTAMP, server_default=func.current_timestamp())
 
 
 class LlmPipeline(Base):
     __tablename__ = "llm_pipeline"
-    __table_args__ = {"schema": "nasa"}
+    __table_args__ = (
+        Index("idx_llm_pipeline_publication", "publication_id", "id"),
+        Index("idx_llm_pipeline_publication_stage", "publication_id", "stage", "status"),
+        {"schema": "nasa"},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    publication_id = Column(Integer, nullable=False)
+    publication_id = Column(Integer, ForeignKey("nasa.publications.id", name="fk_publication", ondelete="CASCADE"), nullable=False)
     stage = Column(String(50))  
     status = Column(String(50), default="pending") 
     result_json = Column(JSONB)  
     message = Column(Text)  
+    text_hash = Column(String(32))
     dat_insercao = Column(TIMESTAMP, server_default=func.current_timestamp())
 
 
 class LlmMemory(Base):
     __tablename__ = "llm_memory"
-    __table_args__ = {"schema": "nasa"}
+    __table_args__ = (
+        Index("idx_llm_memory_pipeline_model", "pipeline_id", "model_name", "chunk_index"),
+        {"schema": "nasa"},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    pipeline_id = Column(Integer, nullable=False)
+    pipeline_id = Column(Integer, ForeignKey("nasa.llm_pipeline.id", name="fk_pipeline", ondelete="CASCADE"), nullable=False)
     model_name = Column(String(50))
     chunk_index = Column(Integer)
     context_json = Column(JSONB)
-    dat_insercao = Column(TIMESTAMP, server_default=func.current_timestamp())
\ No newline at end of file
+    dat_insercao = Column(TIMESTAMP, server_default=func.current_timestamp())
+
+
+class MergedThemes(Base):
+    __tablename__ = "merged_themes"
+    __table_args__ = {"schema": "nasa"}
+
+    publication_id = Column(Integer, ForeignKey("nasa.publications.id", name="fk_merged_publication", ondelete="CASCADE"), primary_key=True)
+    # the qwen run the row was merged from, chunks of another run start it over
+    pipeline_id = Column(Integer)
+    themes = Column(JSONB)
+    theme_counts = Column(JSONB)
+    chunk_count = Column(Integer, default=0)
+    dat_atualizacao = Column(TIMESTAMP, server_default=func.current_timestamp())
+
+
+class ThemeIndex(Base):
+    __tablename__ = "theme_index"
+    __table_args__ = (
+        Index("idx_theme_index_publication", "publication_id"),
+        {"schema": "nasa"},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    publication_id = Column(Integer, ForeignKey("nasa.publications.id", name="fk_theme_publication", ondelete="CASCADE"), nullable=False)
+    theme = Column(Text)
+    details = Column(JSONB)
+    search_text = Column(Text)
+
+
+class ThemeCount(Base):
+    __tablename__ = "theme_counts"
+    __table_args__ = {"schema": "nasa"}
+
+    theme = Column(Text, primary_key=True)
+    occurrences = Column(Integer, default=0)
+    dat_atualizacao = Column(TIMESTAMP, server_default=func.current_timestamp())
+
+
+class CorpusVersion(Base):
+    __tablename__ = "corpus_version"
+    __table_args__ = {"schema": "nasa"}
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, default=0)
+    dat_atualizacao = Column(TIMESTAMP(timezone=True), server_default=func.current_timestamp())
+
+
+class CrawlStatus(Base):
+    __tablename__ = "crawl_status"
+    __table_args__ = {"schema": "nasa"}
+
+    url = Column(Text, primary_key=True)
+    title = Column(String(255))
+    status = Column(String(50), default="pending")
+    attempts = Column(Integer, default=0)
+    message = Column(Text)
+    next_attempt = Column(TIMESTAMP)
+    dat_insercao = Column(TIMESTAMP, server_default=func.current_timestamp())
+    dat_atualizacao = Column(TIMESTAMP, server_default=func.current_timestamp())
+
+
+class PipelineClaim(Base):
+    __tablename__ = "pipeline_claims"
+    __table_args__ = {"schema": "nasa"}
+
+    publication_id = Column(Integer, ForeignKey("nasa.publications.id", name="fk_claim_publication", ondelete="CASCADE"), primary_key=True)
+    worker = Column(String(255))
+    lease_until = Column(TIMESTAMP)
+    dat_insercao = Column(TIMESTAMP, server_default=func.current_timestamp())
+
+
+class Embedding(Base):
+    """What each vector of the FAISS index stands for, the vector id is this id"""
+    __tablename__ = "embeddings"
+    __table_args__ = (
+        Index("idx_embeddings_publication", "publication_id", "model_name", "kind"),
+        {"schema": "nasa"},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    publication_id = Column(Integer, ForeignKey("nasa.publications.id", name="fk_embedding_publication", ondelete="CASCADE"), nullable=False)
+    model_name = Column(String(255), nullable=False)
+    kind = Column(String(16), nullable=False)
+    chunk_index = Column(Integer)
+    theme = Column(Text)
+    content = Column(Text)
+    source_hash = Column(String(32))
+    dat_insercao = Column(TIMESTAMP, server_default=func.current_timestamp())
@@ -1,10 +1,12 @@
-create table if not exists nasa.publication (
+create table if not exists nasa.publications (
     id serial primary key,
     title varchar(255),
     url text,
-    raw_html text,
+    raw_html bytea, -- zstd-compressed html, see models_db.ZstdText
     text_extratect text,
-    dat_insercao timestamp default current_timestamp
+    text_hash varchar(32) generated always as (md5(text_extratect)) stored,
+    dat_insercao timestamp default current_timestamp,
+    constraint uq_publications_url unique (url)
 );
 
 create table if not exists nasa.llm_pipeline (
@@ -14,6 +16,7 @@ create table if not exists nasa.llm_pipeline (
     status varchar(50) default 'pending',
     result_json jsonb,
     message text,
+    text_hash varchar(32),
     dat_insercao timestamp default current_timestamp,
     constraint fk_publication foreign key (publication_id) references nasa.publications(id) on delete cascade
 );
@@ -29,5 +32,92 @@ create table if not exists nasa.llm_memory (
     constraint fk_pipeline foreign key (pipeline_id) references nasa.llm_pipeline(id) on delete cascade
 );
 
+create table if not exists nasa.merged_themes (
+    publication_id integer primary key,
+    pipeline_id integer, -- the qwen run the themes were merged from
+    themes jsonb,
+    theme_counts jsonb,
+    chunk_count integer default 0,
+    dat_atualizacao timestamp default current_timestamp,
+    constraint fk_merged_publication foreign key (publication_id) references nasa.publications(id) on delete cascade
+);
+
+create extension if not exists pg_trgm;
+
+create table if not exists nasa.theme_index (
+    id serial primary key,
+    publication_id integer not null,
+    theme text,
+    details jsonb,
+    search_text text,
+    constraint fk_theme_publication foreign key (publication_id) references nasa.publications(id) on delete cascade
+);
+
+create index if not exists idx_theme_index_publication on nasa.theme_index (publication_id);
+create index if not exists idx_theme_index_theme_trgm on nasa.theme_index using gin (theme gin_trgm_ops);
+create index if not exists idx_theme_index_search_trgm on nasa.theme_index using gin (search_text gin_trgm_ops);
+
+create table if not exists nasa.theme_counts (
+    theme text primary key,
+    occurrences integer default 0,
+    dat_atualizacao timestamp default current_timestamp
+);
+
+create index if not exists idx_theme_counts_occurrences on nasa.theme_counts (occurrences desc);
+
+create table if not exists nasa.corpus_version (
+    id integer primary key,
+    version bigint default 0,
+    dat_atualizacao timestamptz default current_timestamp
+);
+
+insert into nasa.corpus_version (id, version) values (1, 0) on conflict (id) do nothing;
+
 create index if not exists idx_llm_pipeline_result_json on nasa.llm_pipeline using gin (result_json);
-create index if not exists idx_llm_memory_context_json on nasa.llm_memory using gin (context_json);
\ No newline at end of file
+create index if not exists idx_llm_memory_context_json on nasa.llm_memory using gin (context_json);
+
+
+create table if not exists nasa.crawl_status (
+    url text primary key,
+    title varchar(255),
+    status varchar(50) default 'pending',
+    attempts integer default 0,
+    message text,
+    next_attempt timestamp,
+    dat_insercao timestamp default current_timestamp,
+    dat_atualizacao timestamp default current_timestamp
+);
+
+create table if not exists nasa.schema_migrations (
+    version integer primary key,
+    description text,
+    dat_insercao timestamp default current_timestamp
+);
+
+create index if not exists idx_llm_pipeline_publication_stage on nasa.llm_pipeline (publication_id, stage, status);
+
+create table if not exists nasa.pipeline_claims (
+    publication_id integer primary key,
+    worker varchar(255),
+    lease_until timestamp,
+    dat_insercao timestamp default current_timestamp,
+    constraint fk_claim_publication foreign key (publication_id) references nasa.publications(id) on delete cascade
+);
+
+create index if not exists idx_llm_pipeline_publication on nasa.llm_pipeline (publication_id, id);
+create index if not exists idx_llm_memory_pipeline_model on nasa.llm_memory (pipeline_id, model_name, chunk_index);
+
+create table if not exists nasa.embeddings (
+    id serial primary key,
+    publication_id integer not null,
+    model_name varchar(255) not null,
+    kind varchar(16) not null, -- chunk or theme
+    chunk_index integer,
+    theme text,
+    content text,
+    source_hash varchar(32), -- md5 of the text or of the merged themes embedded
+    dat_insercao timestamp default current_timestamp,
+    constraint fk_embedding_publication foreign key (publication_id) references nasa.publications(id) on delete cascade
+);
+
+create index if not exists idx_embeddings_publication on nasa.embeddings (publication_id, model_name, kind);
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+import json
+from typing import Dict, Iterable, Tuple
+
+
+THEME_KEYS = ("points", "cause_effects", "observations", "cascade_effects", "impactful")
+SEARCH_KEYS = ("points", "cause_effects", "observations")
+
+
+def _key(value):
+    """LLM lists are mostly strings, but objects show up too and are not hashable"""
+    return value if isinstance(value, str) else json.dumps(value, sort_keys=True)
+
+
+def merge_memory(themes: Dict, counts: Dict, memory: Dict) -> None:
+    """Fold the themes of one qwen chunk into `themes`, in place.
+
+    Values are deduplicated keeping the order they first appeared, and
+    `counts` records in how many chunks each theme showed up.
+
+    Args:
+        themes (Dict): merged themes, {theme: {key: [values]}} for THEME_KEYS
+        counts (Dict): {theme: number of chunks}
+        memory (Dict): context_json of a qwen chunk, {"themes": {...}}
+    """
+    if not isinstance(memory, dict):
+        return
+
+    for theme, details in (memory.get("themes") or {}).items():
+        merged = themes.setdefault(theme, {key: [] for key in THEME_KEYS})
+        counts[theme] = counts.get(theme, 0) + 1
+        if not isinstance(details, dict):
+            continue
+
+        for key in THEME_KEYS:
+            values = details.get(key) or []
+            if not isinstance(values, list):
+                values = [values]
+            seen = {_key(value) for value in merged[key]}
+            for value in values:
+                if _key(value) not in seen:
+                    seen.add(_key(value))
+                    merged[key].append(value)
+
+
+def merge_memories(memories: Iterable[Dict]) -> Tuple[Dict, Dict, int]:
+    """Merge every chunk memory of a publication
+
+    Returns:
+        merged (Tuple): themes, chunk counts by theme and number of chunks
+    """
+    themes, counts, chunks = {}, {}, 0
+    for memory in memories:
+        if isinstance(memory, dict):
+            merge_memory(themes, counts, memory)
+            chunks += 1
+    return themes, counts, chunks
+
+
+def search_text(details: Dict) -> str:
+    """Flatten the searchable details of a theme into one text for the trigram index"""
+    if not isinstance(details, dict):
+        return ""
+    return "\n".join(
+        value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+        for key in SEARCH_KEYS
+        for value in (details.get(key) or [])
+    )
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+# Author: Yury
+# Data: 18/10/2026
+
+import os
+import sys
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from logs import config as save
+from orm.database import Database, DbError, database_url, embedding_hits, pool_options, theme_hit, theme_search
+from models_bio.models_db import Publications, MergedThemes, ThemeCount, CorpusVersion
+log = save.setup_logs('database_debug.txt')
+
+
+_loops = {}
+_async_engines = {}
+_loops_lock = threading.Lock()
+
+
+def async_database_url() -> str:
+    return database_url().replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Event loop of this process, running forever on a daemon thread.
+    Kept per pid like the engines, a forked worker starts its own"""
+    pid = os.getpid()
+    with _loops_lock:
+        if pid not in _loops:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="async-database", daemon=True).start()
+            _loops[pid] = loop
+        return _loops[pid]
+
+
+def get_async_engine(url: str = None):
+    """asyncpg engine of this process; its connections belong to get_loop()"""
+    url = url or async_database_url()
+    key = (os.getpid(), url)
+    with _loops_lock:
+        if key not in _async_engines:
+            _async_engines[key] = create_async_engine(url, echo=False, **pool_options())
+        return _async_engines[key]
+
+
+class AsyncDatabase:
+    """Read path of the web interface on SQLAlchemy's asyncio engine (asyncpg).
+
+    Request threads hand coroutines to the process event loop with run()
+    and wait for the result there, so the loop multiplexes the queries of
+    every request over one asyncpg pool. Queries of a request that do not
+    depend on each other are sent together with asyncio.gather, each on
+    its own connection. Only the reads of interface/routes.py live here,
+    with the signatures and return shapes of Database; writes stay there.
+    """
+    LISTING_COLUMNS = Database.LISTING_COLUMNS
+
+    def __init__(self, url: str = None, timeout: float = None):
+        """
+        Args:
+            url (str): postgresql+asyncpg url, the one of the .env by default
+            timeout (float): seconds run() waits for a result, DB_QUERY_TIMEOUT or 30
+        """
+        self.loop = get_loop()
+        self.engine = get_async_engine(url)
+        self.factory = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.timeout = timeout or float(os.getenv("DB_QUERY_TIMEOUT", "30"))
+
+    def run(self, coroutine):
+        """Run a coroutine on the event loop and block until its result"""
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise DbError(f"Query did not finish in {self.timeout}s")
+
+    async def fetch(self, statement, params=None):
+        async with self.factory() as session:
+            result = await session.execute(statement, params or {})
+            return result.all()
+
+    async def get_corpus_version(self):
+        """Current corpus version and when it last changed, (0, None) before the first write"""
+        try:
+            rows = await self.fetch(
+                select(CorpusVersion.version, CorpusVersion.dat_atualizacao).where(CorpusVersion.id == 1)
+            )
+            return (rows[0].version, rows[0].dat_atualizacao) if rows else (0, None)
+        except Exception as errors:
+            log.error(f"Error fetching corpus version: {errors}")
+            raise DbError(errors)
+
+    def _documents(self, columns, id=None, after_id=None, limit=10):
+        unknown = set(columns) - set(Publications.__table__.columns.keys())
+        if unknown:
+            raise DbError(f"Unknown publication columns: {unknown}")
+        statement = select(*[getattr(Publications, c) for c in columns]).order_by(Publications.id.asc())
+        if id is not None:
+            return statement.where(Publications.id == id)
+        if after_id is not None:
+            statement = statement.where(Publications.id > after_id)
+        return statement.limit(limit)
+
+    async def get_documents(self, limit=10, id=None, columns=LISTING_COLUMNS, after_id=None):
+        """Rows of nasa.publications with only `columns`, by id or as a keyset page"""
+        try:
+            return await self.fetch(self._documents(columns, id, after_id, limit))
+        except Exception as e:
+            log.error(f"Error fetching documents (id={id}, limit={limit}): {e}")
+            raise DbError(e)
+
+    async def get_documents_with_themes(self, limit=10, id=None, after_id=None, columns=LISTING_COLUMNS):
+        """Documents and their merged themes, read concurrently.
+
+        The themes are the first `limit` rows of nasa.merged_themes after the
+        same cursor: every publication of the page has an id up to the last
+        one of the page, so its themes, if any, are among them.
+
+        Returns:
+            entries (list): [{"document": row, "themes": {...}}] in id order
+        """
+        themes = select(MergedThemes.publication_id, MergedThemes.themes).order_by(MergedThemes.publication_id.asc())
+        if id is not None:
+            themes = themes.where(MergedThemes.publication_id == id)
+        else:
+            if after_id is not None:
+                themes = themes.where(MergedThemes.publication_id > after_id)
+            themes = themes.limit(limit)
+
+        try:
+            documents, merged = await asyncio.gather(
+                self.fetch(self._documents(columns, id, after_id, limit)),
+                self.fetch(themes),
+            )
+        except Exception as e:
+            log.error(f"Error fetching documents with themes (id={id}, limit={limit}): {e}")
+            raise DbError(e)
+
+        merged = {row.publication_id: row.themes for row in merged}
+        return [{"document": doc, "themes": merged.get(doc.id) or {}} for doc in documents]
+
+    async def search_themes(self, keyword="", limit=50, offset=0):
+        """Trigram search over nasa.theme_index, ranked like Database.search_themes"""
+        keyword = (keyword or "").strip()
+        try:
+            statement, params = theme_search(keyword, limit, offset)
+            return [theme_hit(row) for row in await self.fetch(statement, params)]
+        except Exception as errors:
+            log.error(f"Error searching themes for '{keyword}': {errors}")
+            raise DbError(errors)
+
+    async def get_theme_counts(self, top=None, min_count=None):
+        """Number of qwen chunks each theme appeared in, most frequent first"""
+        statement = select(ThemeCount.theme, ThemeCount.occurrences).order_by(
+            ThemeCount.occurrences.desc(), ThemeCount.theme.asc()
+        )
+        if min_count is not None:
+            statement = statement.where(ThemeCount.occurrences >= min_count)
+        if top is not None:
+            statement = statement.limit(top)
+        try:
+            return {row.theme: row.occurrences for row in await self.fetch(statement)}
+        except Exception as errors:
+            log.error(f"Error fetching theme counts: {errors}")
+            raise DbError(errors)
+
+    async def get_embeddings(self, ids):
+        """What the FAISS hits stand for, keyed by id, like Database.get_embeddings"""
+        if not ids:
+            return {}
+        try:
+            return {row.id: row._asdict() for row in await self.fetch(embedding_hits(ids))}
+        except Exception as errors:
+            log.error(f"Error fetching {len(ids)} embeddings: {errors}")
+            raise DbError(errors)
@@ -6,19 +6,26 @@
 
 import os
 import sys
+import copy
+import threading
+from datetime import timedelta
 from dotenv import load_dotenv
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import and_, create_engine, delete, func, select, text, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.postgresql import insert
 
 from logs import config as save
-from models_bio.models_db import (Publications, LlmPipeline, LlmMemory)
+from models_bio.themes import merge_memory, merge_memories, search_text
+from models_bio.migrations.m004_theme_counts import RECOUNT
+from models_bio.models_db import (Base, Publications, LlmPipeline, LlmMemory, CrawlStatus, MergedThemes, ThemeIndex, ThemeCount, CorpusVersion, PipelineClaim, Embedding)
 log = save.setup_logs('database_debug.txt')
 
 
 load_dotenv()
-Base = declarative_base()
+_engines = {}
+_engines_lock = threading.Lock()
 
 
 class DbError(Exception):
@@ -26,32 +33,140 @@ class DbError(Exception):
     pass
 
 
-class Database:
-    def __init__(self):
-        self.user = os.getenv("DB_USER")
-        self.password = os.getenv("DB_PASS")
-        self.host = os.getenv("DB_HOST", "localhost")
-        self.port = os.getenv("DB_PORT", "5432")
-        self.name = os.getenv("DB_NAME")
-        
-        self.engine = create_engine(
-            f"postgresql+psycopg2://{self.user}:{self.password}@{self.host}:{self.port}/{self.name}",
-            echo=False,
+def database_url() -> str:
+    user = os.getenv("DB_USER")
+    password = os.getenv("DB_PASS")
+    host = os.getenv("DB_HOST", "localhost")
+    port = os.getenv("DB_PORT", "5432")
+    name = os.getenv("DB_NAME")
+    return f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{name}"
+
+
+def pool_options() -> dict:
+    """Pool settings from DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE and DB_POOL_PRE_PING, shared by the sync and async engines"""
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+    }
+
+
+def get_engine(url: str = None):
+    """Engine shared by every Database of this process, created on first use.
+
+    Engines are kept per pid, so a forked worker (ProcessPoolExecutor,
+    gunicorn) builds its own pool instead of sharing the parent's sockets.
+    """
+    url = url or database_url()
+    key = (os.getpid(), url)
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = create_engine(url, echo=False, **pool_options())
+        return _engines[key]
+
+
+def theme_search(keyword: str, limit: int, offset: int):
+    """Statement and parameters of search_themes, shared with AsyncDatabase"""
+    if not keyword:
+        return text("""
+            select publication_id, theme, details, 0.0 as score
+            from nasa.theme_index
+            order by publication_id, theme
+            limit :limit offset :offset
+        """), {"limit": limit, "offset": offset}
+
+    escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return text("""
+        select publication_id, theme, details,
+               (case when theme ilike :pattern then 1.0 else 0.0 end)
+               + similarity(theme, :keyword)
+               + 0.5 * word_similarity(:keyword, search_text) as score
+        from nasa.theme_index
+        where theme ilike :pattern or search_text ilike :pattern or theme % :keyword
+        order by score desc, publication_id, theme
+        limit :limit offset :offset
+    """), {"keyword": keyword, "pattern": f"%{escaped}%", "limit": limit, "offset": offset}
+
+
+def embedding_hits(ids):
+    """Statement of get_embeddings, shared with AsyncDatabase"""
+    return (
+        select(
+            Embedding.id, Embedding.publication_id, Embedding.kind, Embedding.chunk_index,
+            Embedding.theme, Embedding.content, Publications.title, Publications.url,
         )
-        self.Session = sessionmaker(bind=self.engine)
+        .join(Publications, Publications.id == Embedding.publication_id)
+        .where(Embedding.id.in_(list(ids)))
+    )
+
+
+def theme_hit(row) -> dict:
+    return {"publication_id": row.publication_id, "theme": row.theme, "details": row.details, "score": round(float(row.score), 4)}
+
+
+class Database:
+    LISTING_COLUMNS = ("id", "title", "url", "dat_insercao")
+    PIPELINE_STAGES = ("qwen_analysis", "llama_insight")
+
+    def __init__(self, scoped: bool = False, url: str = None):
+        """
+        Args:
+            scoped (bool): every call made by a thread until release() shares one
+                pooled connection, for web requests; otherwise each call checks
+                out its own connection
+            url (str): another database than the one of the .env (benchmarks)
+        """
+        self.engine = get_engine(url)
+        self.factory = sessionmaker(bind=self.engine)
+        self.scoped = scoped
+        self.connections = threading.local()
+
+    def Session(self):
+        """New session, bound to the thread's connection in scoped mode"""
+        if not self.scoped:
+            return self.factory()
+        connection = getattr(self.connections, "current", None)
+        if connection is None or connection.closed:
+            connection = self.connections.current = self.engine.connect()
+        return self.factory(bind=connection)
+
+    def release(self):
+        """Give the thread's connection back to the pool (end of a web request)"""
+        connection = getattr(self.connections, "current", None)
+        self.connections.current = None
+        if connection is not None and not connection.closed:
+            connection.close()
+
+    def create_schema(self):
+        """Create the nasa schema and the missing tables of models_bio.
+        Kept out of the constructor; setup scripts call it once"""
+        with self.engine.begin() as connection:
+            connection.execute(text("create schema if not exists nasa"))
         Base.metadata.create_all(self.engine)
 
     def insert_publication(self, title: str, url: str, raw_html: str, text_extratect: str):
-        """Insert a post into the table nasa.publication"""
+        """Insert a post into the table nasa.publications.
+        The url is unique, scraping it again refreshes the stored row"""
         session = self.Session()
         try:
-            pub = Publications(
+            stmt = insert(Publications).values(
                 title=title,
                 url=url,
                 raw_html=raw_html,
                 text_extratect=text_extratect,
             )
-            session.add(pub)
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=[Publications.url],
+                set_={
+                    "title": stmt.excluded.title,
+                    "raw_html": stmt.excluded.raw_html,
+                    "text_extratect": stmt.excluded.text_extratect,
+                },
+            ))
+            self._bump_version(session)
             session.commit()
             log.info(f"Save the database: {title}")
             return "success"
@@ -65,8 +180,9 @@ class Database:
         finally:
             session.close()
 
-    def insert_llm_pipeline(self, publication_id, stage, result_json=None, status="running", message=None):
-        """Creates or updates the execution record of an LLM step"""
+    def insert_llm_pipeline(self, publication_id, stage, result_json=None, status="running", message=None, text_hash=None):
+        """Creates or updates the execution record of an LLM step.
+        text_hash is the md5 of the text_extratect the step analysed"""
         session = self.Session()
         try:
             pipeline = LlmPipeline(
@@ -75,6 +191,7 @@ class Database:
                 result_json=result_json,
                 status=status,
                 message=message,
+                text_hash=text_hash,
             )
             session.add(pipeline)
             session.commit()
@@ -87,8 +204,33 @@ class Database:
         finally:
             session.close()
 
+    def update_llm_pipeline(self, pipeline_id, status, result_json=None, message=None):
+        """Move an existing LLM step to a new status in place (running -> success / failed)"""
+        session = self.Session()
+        try:
+            values = {"status": status, "message": message}
+            if result_json is not None:
+                values["result_json"] = result_json
+            updated = session.execute(
+                update(LlmPipeline).where(LlmPipeline.id == pipeline_id).values(**values)
+            ).rowcount
+            session.commit()
+            if not updated:
+                raise DbError(f"Pipeline {pipeline_id} not found")
+            return pipeline_id
+
+        except DbError:
+            raise
+        except Exception as errors:
+            session.rollback()
+            log.error(f"Error updating pipeline {pipeline_id} to {status}: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
     def insert_llm_memory(self, pipeline_id, model_name, chunk_index, context_json):
-        """Saves the state (incremental memory) of an LLM run"""
+        """Saves the state (incremental memory) of an LLM run.
+        For qwen, the theme frequency aggregate is updated in the same transaction"""
         session = self.Session()
         try:
             mem = LlmMemory(
@@ -98,6 +240,9 @@ class Database:
                 context_json=context_json,
             )
             session.add(mem)
+            if model_name == "qwen":
+                self._count_themes(session, [context_json])
+            self._bump_version(session)
             session.commit()
             return mem.id
 
@@ -108,14 +253,126 @@ class Database:
         finally:
             session.close()
 
-    def get_documents(self, limit=10, id=None):
-        """Busca documentos da base; pode filtrar por ID ou limitar o total."""
+    def insert_llm_memories(self, rows, publication_id=None):
+        """Save a batch of memories with a single multi-row INSERT and commit.
+
+        Args:
+            rows (list): dicts with pipeline_id, model_name, chunk_index and context_json
+            publication_id (int): when given, the qwen rows are also folded into
+                the publication's merged themes in the same transaction
+        """
+        if not rows:
+            return 0
         session = self.Session()
         try:
-            query = session.query(Publications).order_by(Publications.id.asc())
+            session.execute(insert(LlmMemory).values([
+                {
+                    "pipeline_id": row["pipeline_id"],
+                    "model_name": row["model_name"],
+                    "chunk_index": row["chunk_index"],
+                    "context_json": row["context_json"],
+                }
+                for row in rows
+            ]))
+            qwen = [row for row in rows if row["model_name"] == "qwen"]
+            self._count_themes(session, [row["context_json"] for row in qwen])
+            if publication_id is not None:
+                for pipeline_id in dict.fromkeys(row["pipeline_id"] for row in qwen):
+                    self._merge_chunks(session, publication_id, pipeline_id, [
+                        row["context_json"] for row in qwen if row["pipeline_id"] == pipeline_id
+                    ])
+            self._bump_version(session)
+            session.commit()
+            return len(rows)
+
+        except Exception as errors:
+            session.rollback()
+            log.error(f"Error saving {len(rows)} memories: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def _count_themes(self, session, memories):
+        """Add the themes of new qwen memories to nasa.theme_counts
+
+        The aggregate only ever grows: nothing decrements it when memories are deleted
+        (e.g. the duplicate cleanup of migration 8), rebuild_theme_counts recounts it from scratch
+        """
+        increments = {}
+        for memory in memories:
+            themes = memory.get("themes") if isinstance(memory, dict) else None
+            for theme in (themes if isinstance(themes, dict) else {}):
+                increments[theme] = increments.get(theme, 0) + 1
+        if not increments:
+            return
+
+        # rows locked in theme order, so concurrent writers cannot deadlock on each other
+        stmt = insert(ThemeCount).values(
+            [{"theme": theme, "occurrences": count} for theme, count in sorted(increments.items())]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ThemeCount.theme],
+            set_={
+                "occurrences": ThemeCount.occurrences + stmt.excluded.occurrences,
+                "dat_atualizacao": func.current_timestamp(),
+            },
+        )
+        session.execute(stmt)
+
+    def _bump_version(self, session):
+        """Mark the corpus as changed, inside the caller's transaction (invalidates the HTTP cache)"""
+        stmt = insert(CorpusVersion).values(id=1, version=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CorpusVersion.id],
+            set_={"version": CorpusVersion.version + 1, "dat_atualizacao": func.current_timestamp()},
+        )
+        session.execute(stmt)
+
+    def bump_corpus_version(self):
+        """Mark the corpus as changed outside of a write of this class, e.g.
+        after a new FAISS file was saved, so cached search results expire"""
+        session = self.Session()
+        try:
+            self._bump_version(session)
+            session.commit()
+        except Exception as errors:
+            session.rollback()
+            log.error(f"Error bumping corpus version: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def get_corpus_version(self):
+        """Current corpus version and when it last changed
+
+        Returns:
+            state (tuple): (version, dat_atualizacao), (0, None) before the first write
+        """
+        session = self.Session()
+        try:
+            row = session.get(CorpusVersion, 1)
+            return (row.version, row.dat_atualizacao) if row else (0, None)
+        except Exception as errors:
+            log.error(f"Error fetching corpus version: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def get_documents(self, limit=10, id=None, columns=None, after_id=None):
+        """Busca documentos da base; pode filtrar por ID ou limitar o total.
+
+        Args:
+            columns (tuple): project only these columns (e.g. LISTING_COLUMNS), returning rows instead of ORM objects
+            after_id (int): keyset pagination, only ids greater than this one
+        """
+        session = self.Session()
+        try:
+            query = self._documents_query(session, columns)
             if id is not None:
                 result = query.filter(Publications.id == id).all()
             else:
+                if after_id is not None:
+                    query = query.filter(Publications.id > after_id)
                 result = query.limit(limit).all()
 
             return result
@@ -127,6 +384,308 @@ class Database:
         finally:
             session.close()
 
+    def stream_documents(self, columns=None, batch_size=500, after_id=None):
+        """Iterate over every document in id order, loading `batch_size` rows at a time (for batch jobs)"""
+        session = self.Session()
+        try:
+            query = self._documents_query(session, columns)
+            if after_id is not None:
+                query = query.filter(Publications.id > after_id)
+            for document in query.yield_per(batch_size):
+                yield document
+
+        except Exception as e:
+            log.error(f"Erro ao percorrer documentos (after_id={after_id}): {e}")
+            raise DbError(e)
+
+        finally:
+            session.close()
+
+    def _documents_query(self, session, columns=None):
+        if not columns:
+            return session.query(Publications).order_by(Publications.id.asc())
+
+        unknown = [c for c in columns if c not in Publications.__table__.columns]
+        if unknown:
+            raise DbError(f"Unknown publication columns: {unknown}")
+        return (
+            session.query(*[getattr(Publications, c) for c in columns])
+            .order_by(Publications.id.asc())
+        )
+
+    def get_documents_with_memories(self, limit=10, id=None, after_id=None, columns=LISTING_COLUMNS, model_name="qwen"):
+        """Fetch documents together with the memories of all their pipelines, in two queries.
+
+        Returns:
+            entries (list): [{"document": row, "memories": [context_json, ...]}] in id order;
+            memories follow pipeline id then memory id, like get_all_llm_memories
+        """
+        session = self.Session()
+        try:
+            query = self._documents_query(session, columns)
+            if id is not None:
+                query = query.filter(Publications.id == id)
+            else:
+                if after_id is not None:
+                    query = query.filter(Publications.id > after_id)
+                query = query.limit(limit)
+            documents = query.all()
+
+            memories = {doc.id: [] for doc in documents}
+            if memories:
+                rows = (
+                    session.query(LlmPipeline.publication_id, LlmMemory.context_json)
+                    .join(LlmMemory, LlmMemory.pipeline_id == LlmPipeline.id)
+                    .filter(
+                        LlmPipeline.publication_id.in_(list(memories)),
+                        LlmMemory.model_name == model_name,
+                    )
+                    .order_by(LlmPipeline.id.asc(), LlmMemory.id.asc())
+                    .all()
+                )
+                for publication_id, context_json in rows:
+                    if context_json:
+                        memories[publication_id].append(context_json)
+
+            return [{"document": doc, "memories": memories[doc.id]} for doc in documents]
+
+        except Exception as e:
+            log.error(f"Error fetching documents with memories (id={id}, limit={limit}): {e}")
+            raise DbError(e)
+
+        finally:
+            session.close()
+
+    def get_documents_with_themes(self, limit=10, id=None, after_id=None, columns=LISTING_COLUMNS):
+        """Fetch documents with their materialized merged themes in one query.
+
+        Returns:
+            entries (list): [{"document": row, "themes": {...}}] in id order
+        """
+        session = self.Session()
+        try:
+            query = self._documents_query(session, columns).add_columns(MergedThemes.themes).outerjoin(
+                MergedThemes, MergedThemes.publication_id == Publications.id
+            )
+            if id is not None:
+                query = query.filter(Publications.id == id)
+            else:
+                if after_id is not None:
+                    query = query.filter(Publications.id > after_id)
+                query = query.limit(limit)
+
+            return [{"document": row, "themes": row.themes or {}} for row in query.all()]
+
+        except Exception as e:
+            log.error(f"Error fetching documents with themes (id={id}, limit={limit}): {e}")
+            raise DbError(e)
+
+        finally:
+            session.close()
+
+    def save_merged_themes(self, publication_id, themes=None, pipeline_id=None):
+        """Rebuild the merged themes of a publication from the qwen memories of
+        one pipeline; the themes of runs over an older text are left out
+
+        Args:
+            themes (dict): stored instead of the merge, e.g. the ones consolidated
+                by qwen in map_reduce; chunk counts are kept for the names it shares with the memories
+            pipeline_id (int): the qwen run to merge, by default the latest one
+                over the current text_extratect
+        """
+        session = self.Session()
+        try:
+            if session.get(Publications, publication_id) is None:
+                raise DbError(f"Publication {publication_id} not found")
+            if pipeline_id is None:
+                pipeline_id = self._current_qwen_pipeline(session, publication_id)
+            memories = session.execute(
+                select(LlmMemory.context_json)
+                .where(LlmMemory.pipeline_id == pipeline_id, LlmMemory.model_name == "qwen")
+                .order_by(LlmMemory.id.asc())
+            ).scalars().all() if pipeline_id is not None else []
+            merged, counts, chunks = merge_memories(memories)
+            if themes is None:
+                themes = merged
+            else:
+                counts = {theme: counts[theme] for theme in themes if theme in counts}
+
+            stmt = insert(MergedThemes).values(
+                publication_id=publication_id,
+                pipeline_id=pipeline_id,
+                themes=themes,
+                theme_counts=counts,
+                chunk_count=chunks,
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[MergedThemes.publication_id],
+                set_={
+                    "pipeline_id": stmt.excluded.pipeline_id,
+                    "themes": stmt.excluded.themes,
+                    "theme_counts": stmt.excluded.theme_counts,
+                    "chunk_count": stmt.excluded.chunk_count,
+                    "dat_atualizacao": func.current_timestamp(),
+                },
+            )
+            session.execute(stmt)
+            self._index_themes(session, publication_id, themes)
+            self._bump_version(session)
+            session.commit()
+            log.info(f"Merged {len(themes)} themes of publication {publication_id} from {chunks} chunks")
+            return len(themes)
+
+        except DbError:
+            session.rollback()
+            raise
+        except Exception as errors:
+            session.rollback()
+            log.error(f"Error saving merged themes of publication {publication_id}: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    @staticmethod
+    def _current_qwen_pipeline(session, publication_id):
+        """Latest qwen run over the current text_extratect of a publication, None without one"""
+        return session.execute(
+            select(LlmPipeline.id)
+            .join(Publications, Publications.id == LlmPipeline.publication_id)
+            .where(
+                LlmPipeline.publication_id == publication_id,
+                LlmPipeline.stage == "qwen_analysis",
+                LlmPipeline.text_hash == Publications.text_hash,
+            )
+            .order_by(LlmPipeline.id.desc())
+            .limit(1)
+        ).scalar()
+
+    def merge_theme_chunk(self, publication_id, pipeline_id, context_json):
+        """Incrementally fold one new qwen chunk into the merged themes of a publication"""
+        session = self.Session()
+        try:
+            merged = self._merge_chunks(session, publication_id, pipeline_id, [context_json])
+            self._bump_version(session)
+            session.commit()
+            return merged
+
+        except Exception as errors:
+            session.rollback()
+            log.error(f"Error merging chunk into publication {publication_id}: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def _merge_chunks(self, session, publication_id, pipeline_id, contexts):
+        """Fold qwen chunks of `pipeline_id` into nasa.merged_themes inside the
+        caller's transaction. The row of another run, e.g. over the text before
+        a re-extraction, is not folded into but started over"""
+        session.execute(
+            insert(MergedThemes)
+            .values(publication_id=publication_id, pipeline_id=pipeline_id, themes={}, theme_counts={}, chunk_count=0)
+            .on_conflict_do_nothing(index_elements=[MergedThemes.publication_id])
+        )
+        row = session.get(MergedThemes, publication_id, with_for_update=True)
+        if row.pipeline_id == pipeline_id:
+            themes, counts, chunks = copy.deepcopy(row.themes or {}), dict(row.theme_counts or {}), row.chunk_count or 0
+        else:
+            themes, counts, chunks = {}, {}, 0
+        for context_json in contexts:
+            merge_memory(themes, counts, context_json)
+        row.pipeline_id = pipeline_id
+        row.themes = themes
+        row.theme_counts = counts
+        row.chunk_count = chunks + len(contexts)
+        row.dat_atualizacao = func.current_timestamp()
+        self._index_themes(session, publication_id, themes)
+        return len(themes)
+
+    def _index_themes(self, session, publication_id, themes):
+        """Replace the search rows of a publication, inside the caller's transaction"""
+        session.query(ThemeIndex).filter(ThemeIndex.publication_id == publication_id).delete(synchronize_session=False)
+        rows = [
+            {"publication_id": publication_id, "theme": theme, "details": details, "search_text": search_text(details)}
+            for theme, details in themes.items()
+        ]
+        if rows:
+            session.execute(insert(ThemeIndex), rows)
+
+    def search_themes(self, keyword="", limit=50, offset=0):
+        """Search theme names and details through the trigram indexes of nasa.theme_index.
+
+        Matches are ranked by an exact substring hit on the name, then by name
+        similarity and by how well the keyword matches the details.
+
+        Returns:
+            themes (list): [{"publication_id", "theme", "details", "score"}]
+        """
+        session = self.Session()
+        try:
+            keyword = (keyword or "").strip()
+            statement, params = theme_search(keyword, limit, offset)
+            return [theme_hit(row) for row in session.execute(statement, params).all()]
+        except Exception as errors:
+            log.error(f"Error searching themes for '{keyword}': {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def get_theme_counts(self, top=None, min_count=None):
+        """Number of qwen chunks each theme appeared in, read from the nasa.theme_counts aggregate
+
+        Args:
+            top (int): keep only the N most frequent themes
+            min_count (int): drop themes seen fewer times than this
+        """
+        session = self.Session()
+        try:
+            query = session.query(ThemeCount.theme, ThemeCount.occurrences).order_by(
+                ThemeCount.occurrences.desc(), ThemeCount.theme.asc()
+            )
+            if min_count is not None:
+                query = query.filter(ThemeCount.occurrences >= min_count)
+            if top is not None:
+                query = query.limit(top)
+            return {row.theme: row.occurrences for row in query.all()}
+        except Exception as errors:
+            log.error(f"Error fetching theme counts: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def rebuild_theme_counts(self):
+        """Recount nasa.theme_counts from every qwen memory stored (the query of migration 4)
+
+        Returns:
+            themes (int): number of themes counted
+        """
+        session = self.Session()
+        try:
+            # blocks the increments of concurrent writers until the recount commits
+            session.execute(text("lock table nasa.theme_counts in share row exclusive mode"))
+            session.execute(delete(ThemeCount))
+            result = session.execute(text(RECOUNT))
+            session.commit()
+            return result.rowcount
+        except Exception as errors:
+            session.rollback()
+            log.error(f"Error rebuilding theme counts: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def get_raw_html(self, id):
+        """Retrieve the original page of a publication (deferred and stored compressed)"""
+        session = self.Session()
+        try:
+            return session.execute(
+                select(Publications.raw_html).where(Publications.id == id)
+            ).scalar_one_or_none()
+        except Exception as errors:
+            log.error(f"Error fetching raw html of publication {id}: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
     def get_last_llm_memory(self, pipeline_id, model_name):
         """Retrieve the last analysis of the document 
         to continue and assimilate where it left off
@@ -161,6 +720,63 @@ class Database:
         finally:
             session.close()
 
+    def get_chunk_memories(self, pipeline_id, model_name):
+        """Memories of a pipeline keyed by chunk_index, used to resume an interrupted run"""
+        session = self.Session()
+        try:
+            records = (
+                session.query(LlmMemory.chunk_index, LlmMemory.context_json)
+                .filter_by(pipeline_id=pipeline_id, model_name=model_name)
+                .order_by(LlmMemory.chunk_index.asc(), LlmMemory.id.asc())
+                .all()
+            )
+            return {chunk_index: context_json for chunk_index, context_json in records if context_json}
+        except Exception as errors:
+            log.error(f"Error fetching chunk memories of pipeline {pipeline_id}: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def get_resumable_pipeline(self, publication_id, stage, text_hash):
+        """Id of the latest run of `stage` if it never succeeded and analysed the same text, else None"""
+        session = self.Session()
+        try:
+            latest = (
+                session.query(LlmPipeline.id, LlmPipeline.status, LlmPipeline.text_hash)
+                .filter(LlmPipeline.publication_id == publication_id, LlmPipeline.stage == stage)
+                .order_by(LlmPipeline.id.desc())
+                .first()
+            )
+            if latest and latest.status in ("running", "failed") and latest.text_hash == text_hash:
+                return latest.id
+            return None
+        except Exception as errors:
+            log.error(f"Error fetching resumable {stage} of publication {publication_id}: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def get_completed_pipeline(self, publication_id, stage, text_hash):
+        """Latest successful run of `stage` over the same text, with its result_json, or None"""
+        session = self.Session()
+        try:
+            return (
+                session.query(LlmPipeline.id, LlmPipeline.result_json)
+                .filter(
+                    LlmPipeline.publication_id == publication_id,
+                    LlmPipeline.stage == stage,
+                    LlmPipeline.status == "success",
+                    LlmPipeline.text_hash == text_hash,
+                )
+                .order_by(LlmPipeline.id.desc())
+                .first()
+            )
+        except Exception as errors:
+            log.error(f"Error fetching completed {stage} of publication {publication_id}: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
     def get_pipelines_by_publication(self, publication_id):
         """Retrieve all LLM pipelines associated with a given publication."""
         session = self.Session()
@@ -177,3 +793,327 @@ class Database:
             raise DbError(e)
         finally:
             session.close()
+
+    def claim_publications(self, worker, limit=1, lease_minutes=120):
+        """Claim publications whose LLM analysis is missing or outdated.
+
+        A publication is pending while any of PIPELINE_STAGES has no successful
+        row for its text_hash, the md5 of text_extratect stored by Postgres. Candidates are locked
+        with FOR UPDATE SKIP LOCKED, so concurrent executors never pick the
+        same rows, and recorded in nasa.pipeline_claims with a lease; a claim
+        whose lease expired (crashed worker) can be taken over.
+
+        Returns:
+            docs (list): rows with id, title and text_extratect
+        """
+        session = self.Session()
+        try:
+            analysed = [
+                select(LlmPipeline.id).where(
+                    LlmPipeline.publication_id == Publications.id,
+                    LlmPipeline.stage == stage,
+                    LlmPipeline.status == "success",
+                    LlmPipeline.text_hash == Publications.text_hash,
+                ).exists()
+                for stage in self.PIPELINE_STAGES
+            ]
+            leased = select(PipelineClaim.publication_id).where(
+                PipelineClaim.publication_id == Publications.id,
+                PipelineClaim.lease_until > func.current_timestamp(),
+            ).exists()
+            candidates = session.execute(
+                select(Publications.id)
+                .where(Publications.text_extratect.isnot(None), ~and_(*analysed), ~leased)
+                .order_by(Publications.id)
+                .limit(limit)
+                .with_for_update(of=Publications, skip_locked=True)
+            ).scalars().all()
+            if not candidates:
+                session.commit()
+                return []
+
+            lease_until = func.current_timestamp() + timedelta(minutes=lease_minutes)
+            stmt = insert(PipelineClaim).values(
+                [{"publication_id": id, "worker": worker, "lease_until": lease_until} for id in candidates]
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[PipelineClaim.publication_id],
+                set_={
+                    "worker": stmt.excluded.worker,
+                    "lease_until": stmt.excluded.lease_until,
+                    "dat_insercao": func.current_timestamp(),
+                },
+                where=PipelineClaim.lease_until <= func.current_timestamp(),
+            ).returning(PipelineClaim.publication_id)
+            claimed = session.execute(stmt).scalars().all()
+
+            docs = session.execute(
+                select(Publications.id, Publications.title, Publications.text_extratect)
+                .where(Publications.id.in_(claimed))
+                .order_by(Publications.id)
+            ).all()
+            session.commit()
+            log.info(f"Worker {worker} claimed {len(docs)} publications")
+            return docs
+
+        except Exception as errors:
+            session.rollback()
+            log.error(f"Error claiming publications for {worker}: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def release_claim(self, publication_id, worker):
+        """Drop the claim of a finished publication, only if `worker` still holds it"""
+        session = self.Session()
+        try:
+            session.execute(
+                delete(PipelineClaim).where(
+                    PipelineClaim.publication_id == publication_id,
+                    PipelineClaim.worker == worker,
+                )
+            )
+            session.commit()
+            return "success"
+
+        except Exception as errors:
+            session.rollback()
+            log.error(f"Error releasing claim of publication {publication_id}: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def get_publication_urls(self):
+        """Retrieve, in a single query, the URL of every stored publication"""
+        session = self.Session()
+        try:
+            return {url for (url,) in session.query(Publications.url).all()}
+        except Exception as errors:
+            log.error(f"Error fetching publication urls: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def get_crawl_status(self):
+        """Retrieve the crawl state of every link already visited, keyed by URL"""
+        session = self.Session()
+        try:
+            return {
+                row.url: {
+                    "status": row.status,
+                    "attempts": row.attempts or 0,
+                    "next_attempt": row.next_attempt,
+                    "message": row.message,
+                }
+                for row in session.query(CrawlStatus).all()
+            }
+        except Exception as errors:
+            log.error(f"Error fetching crawl status: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def save_crawl_status(self, url, title, status, message=None, next_attempt=None):
+        """Creates or updates the crawl state of a link; failures increase the attempt counter"""
+        session = self.Session()
+        try:
+            failed = 1 if status == "failed" else 0
+            stmt = insert(CrawlStatus).values(
+                url=url,
+                title=title,
+                status=status,
+                attempts=failed,
+                message=message,
+                next_attempt=next_attempt,
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[CrawlStatus.url],
+                set_={
+                    "title": stmt.excluded.title,
+                    "status": stmt.excluded.status,
+                    "attempts": CrawlStatus.attempts + failed,
+                    "message": stmt.excluded.message,
+                    "next_attempt": stmt.excluded.next_attempt,
+                    "dat_atualizacao": func.current_timestamp(),
+                },
+            )
+            session.execute(stmt)
+            session.commit()
+            return "success"
+
+        except Exception as errors:
+            session.rollback()
+            log.error(f"Error saving crawl status {url}: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def iter_raw_html(self, batch_size=200):
+        """Stream (id, raw_html) of every publication in batches through a server-side cursor"""
+        session = self.Session()
+        try:
+            stmt = (
+                select(Publications.id, Publications.raw_html)
+                .where(Publications.raw_html.isnot(None))
+                .order_by(Publications.id.asc())
+                .execution_options(yield_per=batch_size)
+            )
+            for partition in session.execute(stmt).partitions():
+                yield [(row.id, row.raw_html) for row in partition]
+        except Exception as errors:
+            log.error(f"Error streaming raw html: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def update_text_extracted(self, rows):
+        """Bulk update text_extratect; rows is a list of {"id": ..., "text_extratect": ...}"""
+        if not rows:
+            return 0
+        session = self.Session()
+        try:
+            session.execute(update(Publications), rows)
+            self._bump_version(session)
+            session.commit()
+            return len(rows)
+
+        except Exception as errors:
+            session.rollback()
+            log.error(f"Error updating extracted text of {len(rows)} publications: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def get_stale_embeddings(self, model_name, publication_ids=None):
+        """Publications whose vectors of `model_name` are missing or were computed
+        from another text or other merged themes than the ones stored now.
+
+        Returns:
+            stale (list): [{"publication_id", "text_hash", "themes_hash", "chunks", "themes"}],
+                chunks and themes telling which kind has to be embedded again
+        """
+        session = self.Session()
+        try:
+            only = "and p.id = any(:ids)" if publication_ids is not None else ""
+            rows = session.execute(text(f"""
+                select s.* from (
+                    select p.id as publication_id,
+                           p.text_hash,
+                           case when m.themes is not null and m.themes <> '{{}}'::jsonb then md5(m.themes::text) end as themes_hash,
+                           (select max(e.source_hash) from nasa.embeddings e
+                            where e.publication_id = p.id and e.model_name = :model and e.kind = 'chunk') as chunk_hash,
+                           (select max(e.source_hash) from nasa.embeddings e
+                            where e.publication_id = p.id and e.model_name = :model and e.kind = 'theme') as theme_hash
+                    from nasa.publications p
+                    left join nasa.merged_themes m on m.publication_id = p.id
+                    where coalesce(p.text_extratect, '') <> '' {only}
+                ) s
+                where s.text_hash is distinct from s.chunk_hash or s.themes_hash is distinct from s.theme_hash
+                order by s.publication_id
+            """), {"model": model_name, "ids": list(publication_ids or [])}).all()
+            return [
+                {
+                    "publication_id": row.publication_id,
+                    "text_hash": row.text_hash,
+                    "themes_hash": row.themes_hash,
+                    "chunks": row.text_hash != row.chunk_hash,
+                    "themes": row.themes_hash != row.theme_hash,
+                }
+                for row in rows
+            ]
+        except Exception as errors:
+            log.error(f"Error fetching stale embeddings of {model_name}: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def get_embedding_sources(self, publication_ids):
+        """Text and merged themes of the publications about to be embedded"""
+        session = self.Session()
+        try:
+            return (
+                session.query(Publications.id, Publications.text_extratect, MergedThemes.themes)
+                .outerjoin(MergedThemes, MergedThemes.publication_id == Publications.id)
+                .filter(Publications.id.in_(list(publication_ids)))
+                .order_by(Publications.id.asc())
+                .all()
+            )
+        except Exception as errors:
+            log.error(f"Error fetching embedding sources: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def replace_embeddings(self, model_name, kind, groups):
+        """Swap the vector metadata of one kind for several publications, in one transaction
+
+        Args:
+            groups (dict): {publication_id: [{"chunk_index", "theme", "content", "source_hash"}]}
+
+        Returns:
+            ids (tuple): (ids deleted, ids inserted in the order of the rows)
+        """
+        if not groups:
+            return [], []
+        session = self.Session()
+        try:
+            removed = session.execute(
+                delete(Embedding)
+                .where(
+                    Embedding.publication_id.in_(list(groups)),
+                    Embedding.model_name == model_name,
+                    Embedding.kind == kind,
+                )
+                .returning(Embedding.id)
+            ).scalars().all()
+
+            rows = [
+                dict(row, publication_id=publication_id, model_name=model_name, kind=kind)
+                for publication_id, items in groups.items()
+                for row in items
+            ]
+            inserted = []
+            if rows:
+                inserted = session.execute(
+                    insert(Embedding).returning(Embedding.id, sort_by_parameter_order=True), rows
+                ).scalars().all()
+            self._bump_version(session)
+            session.commit()
+            return removed, inserted
+
+        except Exception as errors:
+            session.rollback()
+            log.error(f"Error replacing {kind} embeddings of {len(groups)} publications: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def get_embedding_ids(self, model_name):
+        """Every vector id of `model_name` with its publication, to reconcile the FAISS file"""
+        session = self.Session()
+        try:
+            rows = session.query(Embedding.id, Embedding.publication_id).filter(Embedding.model_name == model_name).all()
+            return {row.id: row.publication_id for row in rows}
+        except Exception as errors:
+            log.error(f"Error fetching embedding ids of {model_name}: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()
+
+    def get_embeddings(self, ids):
+        """What the FAISS hits stand for, with the title and url of their publication
+
+        Returns:
+            hits (dict): {id: {"id", "publication_id", "kind", "chunk_index", "theme", "content", "title", "url"}}
+        """
+        if not ids:
+            return {}
+        session = self.Session()
+        try:
+            rows = session.execute(embedding_hits(ids)).all()
+            return {row.id: row._asdict() for row in rows}
+        except Exception as errors:
+            log.error(f"Error fetching {len(ids)} embeddings: {errors}")
+            raise DbError(errors)
+        finally:
+            session.close()